@@ -0,0 +1,222 @@
+#!/usr/bin/python
+"""
+Benchmarks for the hot paths of pyfactory (build, create, attributes_for).
+
+Every case reports the operations per second and the retained bytes per
+operation: the sizes (sys.getsizeof) of the objects making up the result of
+an operation, i.e. the instances, their dictionaries and the containers and
+values reachable from them. Objects shared by the results (e.g. the static
+values of a factory) are counted only once.
+
+  python benchmarks/bench.py                     # run all cases
+  python benchmarks/bench.py -k foreign          # run matching cases only
+  python benchmarks/bench.py --save base.json    # store the results
+  python benchmarks/bench.py --compare base.json # flag regressions
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import pyfactory
+from pyfactory.factory import FactoryElement
+
+class Model(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def save(self):
+        pass
+
+def register(name, attrs):
+    pyfactory.Factory._add_factory(FactoryElement(name, Model, attrs))
+    return name
+
+def static_factory(width):
+    return register('bench_static_%d' % width, dict(
+        ('field%d' % i, i) for i in xrange(width)
+    ))
+
+def generator_factory(width):
+    return register('bench_generator_%d' % width, dict(
+        ('field%d' % i, pyfactory.Generator(str)) for i in xrange(width)
+    ))
+
+def foreign_chain(depth):
+    name = register('bench_chain_%d_0' % depth, {'value': 1})
+    for level in xrange(1, depth + 1):
+        name = register('bench_chain_%d_%d' % (depth, level), {
+            'value':  level,
+            'parent': pyfactory.Foreign(name)
+        })
+    return name
+
+def many_factories(count):
+    for i in xrange(count):
+        register('bench_many_%d_%d' % (count, i), {'value': i})
+    return 'bench_many_%d_%d' % (count, count / 2)
+
+class SaveBackend(pyfactory.Backend):
+    def save(self, obj):
+        pass
+
+def cases():
+    """
+    returns -- a list of (name, function) pairs. The functions perform a
+    single operation and return its result.
+    """
+    factory = pyfactory.Factory
+    result  = []
+    for width in (10, 50, 200):
+        name = static_factory(width)
+        result.append(('build static width=%d' % width,
+                       lambda name=name: factory.build(name)))
+        result.append(('attributes_for static width=%d' % width,
+                       lambda name=name: factory.attributes_for(name)))
+    for width in (1, 10):
+        name = generator_factory(width)
+        result.append(('build generators width=%d' % width,
+                       lambda name=name: factory.build(name)))
+    for depth in (1, 4, 8):
+        name = foreign_chain(depth)
+        result.append(('build foreign depth=%d' % depth,
+                       lambda name=name: factory.build(name)))
+    for count in (10, 5000):
+        name = many_factories(count)
+        result.append(('build registered=%d' % count,
+                       lambda name=name: factory.build(name)))
+    name = static_factory(20)
+    result.append(('create stub backend width=20',
+                   lambda name=name: factory.create(name)))
+    result.append(('build_batch static width=20 n=100',
+                   lambda name=name: factory.build_batch(name, 100)))
+    return result
+
+def retained_size(root):
+    """
+    Returns the sum of the sizes of the objects reachable from root through
+    containers, instance dictionaries and slots. Classes, functions and
+    modules aren't followed.
+    """
+    seen  = set()
+    stack = [root]
+    size  = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.iterkeys())
+            stack.extend(obj.itervalues())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (type, type(sys), type(retained_size))):
+            stack.extend(getattr(obj, '__dict__', {}).itervalues())
+            if hasattr(obj, '__dict__'):
+                size += sys.getsizeof(obj.__dict__)
+            for slot in getattr(type(obj), '__slots__', ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return size
+
+def measure(function, duration):
+    """
+    Runs the function repeatedly for about duration seconds.
+
+    returns -- a tuple (operations per second, retained bytes per operation).
+    """
+    count, elapsed = 1, 0.0
+    while elapsed < duration / 10.0:
+        count *= 2
+        started = time.time()
+        for i in xrange(count):
+            function()
+        elapsed = time.time() - started
+    count = max(1, int(count * duration / elapsed / 3))
+
+    best = None
+    for repeat in xrange(3):
+        started = time.time()
+        for i in xrange(count):
+            function()
+        elapsed = time.time() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    results = [function() for i in xrange(1000)]
+    size    = retained_size(results) - sys.getsizeof(results)
+    return count / best, size / 1000.0
+
+def run(pattern, duration):
+    pyfactory.backends['bench'] = SaveBackend()
+    pyfactory.type = 'bench'
+    results = {}
+    for name, function in cases():
+        if pattern and pattern not in name:
+            continue
+        ops, size = measure(function, duration)
+        results[name] = {'ops_per_sec': ops, 'bytes_per_op': size}
+        print '%-45s %12.0f ops/s %10.1f bytes/op' % (name, ops, size)
+    return results
+
+def compare(results, baseline, threshold, memory_threshold):
+    """
+    Compares the results with the baseline and prints the regressions.
+    Baselines without bytes per operation are compared by speed only.
+
+    returns -- the number of regressions.
+    """
+    regressions = 0
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        speed = result['ops_per_sec'] / base['ops_per_sec'] - 1.0
+        flags = []
+        if speed < -threshold:
+            flags.append('%.0f%% slower' % (-speed * 100))
+        if 'bytes_per_op' in base:
+            more = result['bytes_per_op'] - base['bytes_per_op']
+            if more > base['bytes_per_op'] * memory_threshold:
+                flags.append('%.1f more bytes/op' % more)
+        if flags:
+            regressions += 1
+            print 'REGRESSION %-45s %s' % (name, ', '.join(flags))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-k', dest='pattern', help='only run matching cases')
+    parser.add_argument('--duration', type=float, default=1.0,
+                        help='seconds per case (default: 1)')
+    parser.add_argument('--save', metavar='FILE', help='store the results')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare with stored results')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='tolerated slowdown (default: 0.15)')
+    parser.add_argument('--memory-threshold', type=float, default=0.05,
+                        help='tolerated growth of the bytes per operation '
+                             '(default: 0.05)')
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.duration)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python':  platform.python_version(),
+                'results': results
+            }, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold,
+                   args.memory_threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,22 @@
 from factory import Factory, FactoryException, FactoryBuilder, FactoryObject, \
-                    FactoryAttribute, Foreign, Generator, UniqueIDGenerator
-save_functions = {
-    'django-orm': 'save',
-    'appengine':  'put'
+                    FactoryAttribute, Foreign, Generator, Sequence, \
+                    LazyAttribute, UniqueIDGenerator, each
+from counters import LocalCounter, SharedMemoryCounter, FileCounter
+from snapshot import SnapshotCache
+import export
+import manifest
+import providers
+import profiling
+from persistence import Backend, MethodBackend, DjangoBackend, \
+                        AppEngineBackend
+backends = {
+    'django-orm': DjangoBackend(),
+    'appengine':  AppEngineBackend()
 }
 type = 'django-orm'
 
-def save_function():
-    return save_functions[type]
+def backend():
+    return backends[type]
 
 __all__ = [ 
     'Factory',
@@ -16,6 +25,18 @@ __all__ = [
     'FactoryAttribute',
     'Foreign',
     'Generator',
+    'Sequence',
+    'LazyAttribute',
     'UniqueIDGenerator',
+    'each',
+    'LocalCounter',
+    'SharedMemoryCounter',
+    'FileCounter',
+    'Backend',
+    'MethodBackend',
+    'DjangoBackend',
+    'AppEngineBackend',
+    'SnapshotCache',
+    'backends',
     'type'
 ]
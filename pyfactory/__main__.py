@@ -0,0 +1,3 @@
+from pyfactory.cli import main
+
+main()
@@ -0,0 +1,80 @@
+import sys
+import argparse
+import importlib
+import export
+import manifest
+
+# =========================================================================== 
+# Command line interface (python -m pyfactory)
+# =========================================================================== 
+
+def _dump(args):
+    overrides = dict(item.split('=', 1) for item in args.set)
+    output = sys.stdout
+    if args.output:
+        output = open(args.output, 'wb')
+    try:
+        export.dump(
+            args.factory, args.n, output, args.format,
+            fk_field=args.fk_field, overrides=overrides
+        )
+    finally:
+        if args.output:
+            output.close()
+
+def _manifest(args):
+    output = sys.stdout
+    if args.output:
+        output = open(args.output, 'w')
+    try:
+        manifest.write(manifest.scan(args.path, args.root), output)
+    finally:
+        if args.output:
+            output.close()
+
+def parser():
+    parser = argparse.ArgumentParser(prog='python -m pyfactory')
+    commands = parser.add_subparsers()
+
+    dump = commands.add_parser(
+        'dump', help='write the attributes of a factory to a file'
+    )
+    dump.add_argument('factory', help='the name of the factory')
+    dump.add_argument('n', type=int, help='the number of rows')
+    dump.add_argument(
+        '-m', '--module', action='append', default=[],
+        help='a module defining factories (may be given several times)'
+    )
+    dump.add_argument(
+        '-f', '--format', choices=sorted(export.formats), default='csv'
+    )
+    dump.add_argument('-o', '--output', help='the file (default: stdout)')
+    dump.add_argument(
+        '--set', action='append', default=[], metavar='KEY=VALUE',
+        help='override an attribute with a string'
+    )
+    dump.add_argument(
+        '--fk-field', default='id',
+        help='the attribute written for Foreign attributes (default: id)'
+    )
+    dump.set_defaults(command=_dump)
+
+    index = commands.add_parser(
+        'manifest', help='write a manifest mapping factories to modules'
+    )
+    index.add_argument(
+        'path', nargs='+', help='a python file or a directory to scan'
+    )
+    index.add_argument(
+        '-r', '--root', default='.',
+        help='the directory the module names are relative to (default: .)'
+    )
+    index.add_argument('-o', '--output', help='the file (default: stdout)')
+    index.set_defaults(command=_manifest)
+    return parser
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    for module in getattr(args, 'module', []):
+        importlib.import_module(module)
+    args.command(args)
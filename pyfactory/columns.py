@@ -0,0 +1,77 @@
+import factory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# =========================================================================== 
+# Columns
+# =========================================================================== 
+
+class ConstantColumn(object):
+    """
+    A read-only sequence, which repeats a single value n times without
+    copying it.
+    """
+    def __init__(self, value, n):
+        self.value = value
+        self._n    = n
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = xrange(*index.indices(self._n))
+            return ConstantColumn(self.value, len(indices))
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError(index)
+        return self.value
+
+    def __iter__(self):
+        for i in xrange(self._n):
+            yield self.value
+
+    def __repr__(self):
+        return 'ConstantColumn(%r, %d)' % (self.value, self._n)
+
+def _object_array(values, shape):
+    """
+    Returns an array of python objects, which doesn't try to interpret lists
+    or tuples as additional dimensions.
+    """
+    array = numpy.empty(shape, dtype=object)
+    if shape:
+        for i, value in enumerate(values):
+            array[i] = value
+    else:
+        array[()] = values
+    return array
+
+def to_numpy(columns):
+    """
+    Converts the columns into NumPy arrays. Constant columns become read-only
+    broadcast views of a single value.
+
+    columns -- a dictionary with the columns.
+    returns -- a dictionary with the arrays.
+    """
+    if numpy is None:
+        raise factory.FactoryException("NumPy is not installed!")
+
+    arrays = {}
+    for key, column in columns.iteritems():
+        if isinstance(column, ConstantColumn):
+            array = numpy.asarray(column.value)
+            if array.ndim != 0:
+                array = _object_array(column.value, ())
+            arrays[key] = numpy.broadcast_to(array, (len(column),))
+        else:
+            array = numpy.asarray(column)
+            if array.ndim != 1:
+                array = _object_array(column, (len(column),))
+            arrays[key] = array
+    return arrays
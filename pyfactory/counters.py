@@ -0,0 +1,94 @@
+import os
+import fcntl
+import threading
+import multiprocessing
+
+# =========================================================================== 
+# Counters
+# =========================================================================== 
+# A counter hands out disjoint ranges of integers. allocate(size) reserves
+# the next size integers in one atomic step and returns the first one.
+
+class LocalCounter(object):
+    """
+    A counter, which is shared by all threads of the current process.
+
+    value -- the first integer, which hasn't been allocated yet.
+    """
+    def __init__(self, value=0):
+        self.value = value
+        self._lock = threading.Lock()
+
+    def allocate(self, size):
+        with self._lock:
+            start = self.value
+            self.value += size
+        return start
+
+    def reset(self, value=0):
+        with self._lock:
+            self.value = value
+
+    def __repr__(self):
+        return 'LocalCounter()'
+
+class SharedMemoryCounter(object):
+    """
+    A counter living in shared memory. It is shared with all processes, which
+    are forked after the counter has been created (e.g. multiprocessing
+    workers).
+    """
+    def __init__(self, value=0):
+        self._value = multiprocessing.Value('l', value)
+
+    @property
+    def value(self):
+        return self._value.value
+
+    def allocate(self, size):
+        with self._value.get_lock():
+            start = self._value.value
+            self._value.value = start + size
+        return start
+
+    def reset(self, value=0):
+        with self._value.get_lock():
+            self._value.value = value
+
+class FileCounter(object):
+    """
+    A counter stored in a file, which is locked during the allocation. It can
+    be shared by unrelated processes (e.g. pytest-xdist workers). Remove the
+    file to start again at zero.
+
+    path -- the path of the file.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def value(self):
+        return self.allocate(0)
+
+    def allocate(self, size):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            start = int(os.read(fd, 32) or 0)
+            if size:
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, str(start + size))
+        finally:
+            os.close(fd) # releases the lock
+        return start
+
+def default_counter():
+    """
+    Returns a FileCounter if the environment variable PYFACTORY_ID_FILE is
+    set, otherwise a LocalCounter.
+    """
+    path = os.environ.get('PYFACTORY_ID_FILE')
+    if path:
+        return FileCounter(path)
+    return LocalCounter()
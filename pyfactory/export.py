@@ -0,0 +1,112 @@
+import re
+import csv
+import json
+import pyfactory
+from factory import FactoryException, Foreign
+
+# =========================================================================== 
+# Export
+# =========================================================================== 
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return unicode(value)
+
+_copy_special = re.compile(r'[\\\t\n\r]')
+_copy_escapes = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+
+def _copy_value(value):
+    """
+    Formats a single value for the text format of PostgreSQL's COPY.
+    """
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, (int, long)):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if not isinstance(value, basestring):
+        value = unicode(value)
+    value = _encode(value)
+    if _copy_special.search(value):
+        value = _copy_special.sub(lambda m: _copy_escapes[m.group()], value)
+    return value
+
+def _write_csv(fileobj, columns, rows):
+    writer = csv.writer(fileobj)
+    writer.writerow(columns)
+    for chunk in rows:
+        writer.writerows([map(_encode, row) for row in chunk])
+
+def _write_jsonl(fileobj, columns, rows):
+    dumps = json.JSONEncoder(
+        separators=(',', ':'), default=_json_default
+    ).encode
+    for chunk in rows:
+        fileobj.write(''.join(
+            dumps(dict(zip(columns, row))) + '\n' for row in chunk
+        ))
+
+def _write_copy(fileobj, columns, rows):
+    for chunk in rows:
+        fileobj.write(''.join(
+            '\t'.join(map(_copy_value, row)) + '\n' for row in chunk
+        ))
+
+formats = {
+    'csv':   _write_csv,
+    'jsonl': _write_jsonl,
+    'copy':  _write_copy
+}
+
+def dump(factory_name, n, fileobj, format='csv', chunk_size=1000,
+         fk_field='id', overrides=None):
+    """
+    Streams the attributes of n objects of the given factory to fileobj.
+    Foreign attributes are written as column '<name>_id', which contains the
+    fk_field of the foreign object (a dictionary or, if the Foreign hands out
+    existing objects, an instance). The rows are generated and written in
+    chunks, so the memory usage doesn't depend on n.
+
+    format -- 'csv' (with a header), 'jsonl' or 'copy' (the text format of
+    PostgreSQL's COPY).
+    returns -- the list of the column names.
+    """
+    if format not in formats:
+        raise FactoryException("Unknown format '%s'!" % format)
+    overrides = overrides or {}
+    element   = pyfactory.Factory._find_factory(factory_name)
+
+    keys = sorted(element.attributes)
+    foreign = set(k for k in keys if isinstance(
+        overrides.get(k, element.attributes[k]), Foreign
+    ))
+    columns = [k + '_id' if k in foreign else k for k in keys]
+    indices = [i for i, k in enumerate(keys) if k in foreign]
+
+    def row(attrs):
+        values = [attrs[k] for k in keys]
+        for i in indices:
+            value = values[i]
+            if isinstance(value, dict):
+                values[i] = value.get(fk_field)
+            else:
+                values[i] = getattr(value, fk_field, None)
+        return values
+
+    rows = (
+        map(row, chunk)
+        for chunk in element.iter_attributes(n, chunk_size, **overrides)
+    )
+    formats[format](fileobj, columns, rows)
+    return columns
@@ -1,4 +1,22 @@
+import os
+import sys
+import copy
+import datetime
+import decimal
+import inspect
+import importlib
+import itertools
+import warnings
+import weakref
+import contextlib
+import threading
+from multiprocessing.pool import ThreadPool
+from multiprocessing.util import register_after_fork
 import pyfactory
+from counters import LocalCounter, default_counter
+import parallel
+import manifest
+from columns import ConstantColumn, to_numpy
 # =========================================================================== 
 # Exceptions
 # =========================================================================== 
@@ -10,6 +28,7 @@ class FactoryException(Exception):
     object
     """
     def __init__(self, msg):
+        Exception.__init__(self, msg)
         self.msg = msg
 
     def __repr__(self):
@@ -26,33 +45,81 @@ class FactoryBuilder(object):
     factories. The actual creation-work is delegated to the FactoryBuilder
     objects.
     """
-    def __init__(self):
-        self._elements = []
+    def __init__(self, duplicates='error'):
+        self._elements   = {}
+        self._lock       = threading.Lock()
+        self._manifest   = None
+        self.duplicates  = duplicates
 
     def _add_factory(self, element):
         """
-        Adds the given element to the list of available factories.
+        Adds the given element to the index of available factories.
+
+        A factory, which is defined by the same class in the same file as
+        the registered one, is ignored: this happens if a module is imported
+        under two names (e.g. 'tests.test_models' and 'test_models').
+        Otherwise, what happens if a factory with the same name is already
+        registered depends on the duplicates-attribute:
+
+        'error' -- a FactoryException is thrown (default)
+        'first' -- the first registered factory is kept
+        'last'  -- the new factory replaces the registered one
 
         element -- An instance of FactoryElement
         """
-        self._elements.append(element)
+        with self._lock:
+            registered = self._elements.get(element.name)
+            if registered is not None:
+                if element.source is not None and \
+                   element.source == registered.source:
+                    return
+                if self.duplicates == 'first':
+                    return
+                if self.duplicates != 'last':
+                    raise FactoryException(
+                        "Factory '%s' is already registered!" % element.name
+                    )
+            self._elements[element.name] = element
 
     def _find_factory(self, name):
         """
         Tries to find a factory with the given name. If no such factory exists
-        a FactoryException is thrown.
+        a FactoryException is thrown. If the factory isn't registered yet, but
+        listed in the manifest (see load_manifest), the module defining it is
+        imported first.
 
         name -- a string which represents the name of the FactoryElement object
         which should be returned by this method.
-        returns -- the first factory is returned, whose name matches with the
-        given name.
+        returns -- the factory registered under the given name.
+        """
+        try:
+            return self._elements[name]
+        except KeyError:
+            module = self._load_manifest().get(name)
+            if module is not None:
+                importlib.import_module(module)
+                if name in self._elements:
+                    return self._elements[name]
+            raise FactoryException("Factory '%s' doesn't exist!" % name)
+
+    def _load_manifest(self):
+        """
+        Returns the manifest. It is initially read from the file given in the
+        environment variable PYFACTORY_MANIFEST (if set).
         """
-        elems = filter(lambda e: e.name == name, self._elements)
-        if not elems:
-            raise FactoryException("Factory :name doesn't exists!".format({
-                'name': name
-            }))
-        return elems[0]
+        if self._manifest is None:
+            path = os.environ.get('PYFACTORY_MANIFEST')
+            self._manifest = manifest.load(path) if path else {}
+        return self._manifest
+
+    def load_manifest(self, path):
+        """
+        Reads the manifest in the file with the given path, which maps the
+        names of the factories to the modules defining them. Factories,
+        which aren't registered yet, are imported on their first use then.
+        The manifest is generated by 'python -m pyfactory manifest'.
+        """
+        self._load_manifest().update(manifest.load(path))
 
     def build(self, factory_name, **kwargs):
         """
@@ -89,26 +156,317 @@ class FactoryBuilder(object):
         """
         factory_object = self._find_factory(factory_name)
         return factory_object.create(**kwargs)
+
+    def build_batch(self, factory_name, n, **kwargs):
+        """
+        Builds (no save!) n objects using the Factory with the given
+        factory_name. Overrides marked by each() contain one value per
+        object.
+
+        factory_name -- the name of the factory, which should be used to build the
+        objects.
+        n -- the number of objects to build.
+        returns -- a list with the created objects.
+        """
+        factory_object = self._find_factory(factory_name)
+        return factory_object.build_batch(n, **kwargs)
+
+    def attributes_for_batch(self, factory_name, n, **kwargs):
+        """
+        Returns a list with n attribute-dictionaries of the Factory with the
+        given factory_name. Overrides marked by each() contain one value
+        per dictionary.
+
+        factory_name -- the name of the factory, whose attributes should be returned
+        n -- the number of dictionaries to return.
+        returns -- a list of dictionaries.
+        """
+        factory_object = self._find_factory(factory_name)
+        return factory_object.attributes_for_batch(n, **kwargs)
+
+    def create_batch(self, factory_name, n, **kwargs):
+        """
+        Creates (saves!) n objects using the Factory with the given
+        factory_name. Overrides marked by each() contain one value per
+        object.
+
+        factory_name -- the name of the factory, which should be used to create the
+        objects.
+        n -- the number of objects to create.
+        returns -- a list with the saved objects.
+        """
+        factory_object = self._find_factory(factory_name)
+        return factory_object.create_batch(n, **kwargs)
+
+    def generate_parallel(self, factory_name, n, workers=None, chunk_size=1000,
+                          method='build', **kwargs):
+        """
+        Generates n objects using the Factory with the given factory_name in
+        a pool of worker processes. The objects are streamed back in chunks.
+
+        factory_name -- the name of the factory, which should be used.
+        n -- the number of objects to generate.
+        workers -- the number of worker processes (default: number of CPUs).
+        chunk_size -- the number of objects generated by a single task.
+        method -- 'build', 'create' or 'attributes_for'.
+        returns -- an iterator over lists with at most chunk_size objects.
+        """
+        self._find_factory(factory_name)
+        return parallel.generate(
+            factory_name, n, workers, chunk_size, method, kwargs
+        )
+
+    def iter_build(self, factory_name, n=None, chunk_size=None, **kwargs):
+        """
+        Lazily builds (no save!) objects using the Factory with the given
+        factory_name. Only the current object (or chunk) is kept in memory.
+
+        factory_name -- the name of the factory, which should be used to build the
+        objects.
+        n -- the number of objects, None for an endless iterator.
+        chunk_size -- if given, lists of chunk_size objects are yielded.
+        returns -- an iterator over the built objects.
+        """
+        factory_object = self._find_factory(factory_name)
+        return factory_object.iter_build(n, chunk_size, **kwargs)
+
+    def iter_attributes(self, factory_name, n=None, chunk_size=None, **kwargs):
+        """
+        Lazily generates attribute-dictionaries of the Factory with the given
+        factory_name. Only the current dictionary (or chunk) is kept in
+        memory.
+
+        factory_name -- the name of the factory, whose attributes should be returned
+        n -- the number of dictionaries, None for an endless iterator.
+        chunk_size -- if given, lists of chunk_size dictionaries are yielded.
+        returns -- an iterator over the dictionaries.
+        """
+        factory_object = self._find_factory(factory_name)
+        return factory_object.iter_attributes(n, chunk_size, **kwargs)
+
+    def columns(self, factory_name, n, numpy=False, **kwargs):
+        """
+        Returns the attributes of n objects of the Factory with the given
+        factory_name in columnar form, ready for bulk loaders.
+
+        factory_name -- the name of the factory, whose attributes should be returned
+        n -- the number of objects.
+        numpy -- if True, NumPy arrays are returned (NumPy must be installed).
+        returns -- a dictionary with one column (sequence) per attribute.
+        """
+        factory_object = self._find_factory(factory_name)
+        return factory_object.columns(n, numpy, **kwargs)
+
+    def dump(self, factory_name, n, fileobj, format='csv', chunk_size=1000,
+             fk_field='id', **kwargs):
+        """
+        Streams the attributes of n objects of the Factory with the given
+        factory_name to fileobj. Foreign attributes are written as the id of
+        the foreign object (column '<name>_id').
+
+        factory_name -- the name of the factory, whose attributes should be written
+        n -- the number of rows.
+        fileobj -- the file to write to.
+        format -- 'csv', 'jsonl' or 'copy' (PostgreSQL COPY text format).
+        chunk_size -- the number of rows generated and written at once.
+        fk_field -- the attribute of the foreign objects, which is written.
+        returns -- the list of the column names.
+        """
+        return pyfactory.export.dump(
+            factory_name, n, fileobj, format, chunk_size, fk_field, kwargs
+        )
+
+    def create_concurrent(self, factory_name, n, concurrency=8, **kwargs):
+        """
+        Creates (saves!) n objects using the Factory with the given
+        factory_name. Up to concurrency objects are created at the same
+        time in a pool of threads, so that blocking saves overlap.
+
+        factory_name -- the name of the factory, which should be used to create the
+        objects.
+        n -- the number of objects to create.
+        concurrency -- the maximum number of objects created at once.
+        returns -- a list with the saved objects.
+        """
+        factory_object = self._find_factory(factory_name)
+        return factory_object.create_concurrent(n, concurrency, **kwargs)
+
+    @contextlib.contextmanager
+    def scope(self):
+        """
+        Opens a build scope for the with-block: Foreign attributes with a
+        sharing policy share their objects between all calls in the block.
+        """
+        with _activate(BuildScope()):
+            yield
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Opens a unit of work for the with-block: created objects are recorded
+        instead of saved. When the block is left without an exception they
+        are saved grouped by class through the save_batch method of the
+        backend, Foreign objects before the objects referring to them. If the
+        block raises an exception the objects are discarded. Nested sessions
+        join the outer one.
+
+        returns -- the Session.
+        """
+        session = _current_session()
+        if session is not None:
+            yield session
+            return
+
+        session = _sessions.current = Session()
+        try:
+            yield session
+        finally:
+            _sessions.current = None
+        session.flush(pyfactory.backend())
+
+    def cleanup(self):
+        """
+        Deletes all tracked objects (see track and tracking), which were
+        created by the factories (including the objects of Foreign
+        attributes) since the last cleanup. The objects are deleted grouped
+        by class through the delete_batch and delete_keys methods of the
+        backend, the objects referring to others first. If the backend
+        fails, the objects not deleted yet are kept for the next cleanup.
+        """
+        _created.delete(pyfactory.backend())
+
+    def track(self, enabled=True):
+        """
+        Enables or disables keeping track of the created objects for
+        cleanup. Tracking is disabled by default.
+        """
+        _created.enabled = enabled
+
+    def tracking(self):
+        """
+        Keeps track of the objects created during the with-block (in all
+        threads) for cleanup.
+        """
+        return _created.block()
+
+    def profile(self):
+        """
+        Profiles the factories during the with-block and yields the Profiler:
+
+        with Factory.profile() as profiler:
+            ...
+        profiler.stats()
+        """
+        return pyfactory.profiling.profile()
+
+    def stats(self):
+        """
+        Returns the profiling statistics of the active (or the last)
+        profile: {factory: {phase: {'calls', 'cumtime', 'selftime'}}}.
+        """
+        return pyfactory.profiling.stats()
+
+    def reset_sequences(self, factory_name=None):
+        """
+        Resets the Sequence attributes of the Factory with the given
+        factory_name (or of all factories), so that they start again with
+        their start value.
+        """
+        if factory_name is None:
+            elements = self._elements.values()
+        else:
+            elements = [self._find_factory(factory_name)]
+        for element in elements:
+            for key, val in element._dynamic:
+                if isinstance(val, Sequence):
+                    Sequence.reset(val.name)
+
+    def invalidate_classes(self):
+        """
+        Forgets the cached model-classes of all factories. Call this after
+        reloading the modules of the models.
+        """
+        for element in self._elements.values():
+            element.invalidate_class()
         
 # The global Factory-object
 Factory = FactoryBuilder()
 
+def _chunked(iterator, chunk_size):
+    """
+    Groups the items of the iterator into lists of chunk_size items. The last
+    list may be shorter. If chunk_size is None the iterator is returned.
+    """
+    if chunk_size is None:
+        return iterator
+    return itertools.takewhile(
+        bool,
+        (list(itertools.islice(iterator, chunk_size)) for _ in itertools.count())
+    )
+
+class Each(object):
+    """
+    Marks an override of the batch methods as one value per object, e.g.
+
+    Factory.build_batch('user', 2, name=each(['first', 'second']))
+
+    All other overrides (including plain lists) are used for every object.
+
+    values -- a list or tuple with one value per object.
+    """
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Each(self.values[index])
+        return self.values[index]
+
+    def __repr__(self):
+        return 'each(%r)' % (self.values,)
+
+each = Each
+
 class FactoryElement(object):
     """
     This class represents one factory, which holds the metadata, the user
     priveded when defining the factory. It's responsibility is to actually
     create the object using the meta-information of the user.
+
+    The elements are shared by all threads, so the build methods must not
+    store any per-call state on the instance.
+
+    prototype -- if True, the objects are cloned from a template instance
+    instead of calling the constructor of the model-class (see _Prototype).
+    record -- if True, the build methods return compact records instead of
+    instances of the model-class (see _record_class). The model-class is
+    only needed for create then and may be None.
+    source -- a tuple (path, class name) identifying the definition of the
+    factory, if it's defined by a FactoryObject-class.
     """
-    def __init__(self, name, klass, attrs):
+    def __init__(self, name, klass, attrs, prototype=False, record=False,
+                 source=None):
         self.name       = name
         self.klass      = klass
         self.attributes = attrs
+        self.prototype  = prototype
+        self.record     = record
+        self.source     = source
+        self._resolved  = None
+        if not isinstance(klass, basestring):
+            self._resolved = klass
+        self._compile()
 
     @property
     def klass_name(self):
         """
         Returns the name of the model-class, without the module-part
         """
+        if not isinstance(self.klass, basestring):
+            return self.klass.__name__
         return self.klass.split('.')[-1]
 
     def _import_module(self):
@@ -125,33 +483,262 @@ class FactoryElement(object):
 
     def _fetch_class(self):
         """
-        Tries to fetch the model-class by searching through modules.
+        Tries to fetch the model-class by searching through modules. The
+        class is only looked up once and cached afterwards.
 
         returns -- The model-class is returned.
         """
-        module = self._import_module()
-        if module:
-            return getattr(module, self.klass_name)
-        return globals[self.klass_name]
+        if self.klass is None:
+            raise FactoryException(
+                "The Factory %s has no klass!" % self.name
+            )
+        if self._resolved is None:
+            module = self._import_module()
+            if module:
+                self._resolved = getattr(module, self.klass_name)
+            else:
+                self._resolved = globals()[self.klass_name]
+        return self._resolved
+
+    def invalidate_class(self):
+        """
+        Forgets the cached model-class, so that it is looked up again on the
+        next build. Call this after reloading the module of the model.
+        Classes, which were given directly in Meta.klass, are kept.
+        """
+        if isinstance(self.klass, basestring):
+            self._resolved = None
+        self._lazy_class = None
+        self._templates  = {}
+
+    def _compile(self):
+        """
+        Compiles the attributes into a build plan: A dictionary with the
+        static values, which is simply copied on each build, a list of
+        (key, value) pairs of the special attributes (FactoryAttribute), which
+        have to be evaluated on each build, and a list of (key, value) pairs
+        of the lazy attributes (LazyAttribute).
+        """
+        self._keys       = frozenset(self.attributes)
+        self._static     = {}
+        self._dynamic    = []
+        self._lazy       = []
+        self._lazy_class = None
+        self._deferred   = {}
+        self._templates  = {}
+        self._records    = None
+        for key, val in self.attributes.items():
+            if isinstance(val, LazyAttribute):
+                self._lazy.append((key, val))
+            elif isinstance(val, FactoryAttribute):
+                self._dynamic.append((key, val.bind(self.name, key)))
+            else:
+                self._static[key] = val
 
-    def _filter_attributes(self, vals):
+    def _build_class(self):
         """
-        Substitutes special attributes (FactoryAttribute) with their actual
-        values and returns a tuple with the new (key, value) pair.
+        Returns the class, which is instantiated by the build methods. If the
+        factory has lazy attributes, this is a generated subclass of the
+        model-class, which evaluates them on first access. Model-classes with
+        a custom metaclass (e.g. Django models) aren't subclassed; their lazy
+        attributes are evaluated eagerly. So are lazy attributes, which are
+        explicit arguments of the constructor. In record mode this is the
+        record class, whose lazy attributes are evaluated eagerly, too.
+        """
+        if self.record:
+            if self._records is None:
+                self._records = _record_class(self.name, sorted(self._keys))
+            return self._records
+        klass = self._fetch_class()
+        if not self._lazy or type(klass) is not type:
+            return klass
+        lazy_class = self._lazy_class
+        if lazy_class is None or (lazy_class is not klass and
+                                  lazy_class.__bases__[0] is not klass):
+            arguments = _init_arguments(klass)
+            deferred  = [(k, v) for k, v in self._lazy if k not in arguments]
+            self._deferred = dict(deferred)
+            lazy_class = klass
+            if deferred:
+                lazy_class = _lazy_subclass(klass, deferred)
+            self._lazy_class = lazy_class
+        return lazy_class
+
+    def _constructor(self, klass, overrides):
+        """
+        Returns a callable, which constructs an object of klass from an
+        attribute-dictionary. This is klass itself unless the factory is in
+        prototype mode: then the objects are cloned from a template, which
+        is constructed once, and only the special and the overridden
+        attributes are assigned to the clones.
+        """
+        if not self.prototype:
+            return klass
+        template = self._templates.get(klass)
+        if template is None:
+            attrs = self._static.copy()
+            for key in self._keys.difference(attrs):
+                attrs[key] = None
+            if klass is self._lazy_class:
+                for key in self._deferred:
+                    del attrs[key]
+            template = self._templates[klass] = _Prototype(klass, attrs)
+        return template.constructor(self._keys.difference(
+            k for k in self._static if k not in overrides
+        ))
+
+    def _resolve_lazy(self, method, attrs, lazy):
+        """
+        Evaluates the lazy attributes into attrs in dependency order. When
+        building, the lazy attributes deferred to the generated subclass (see
+        _build_class) are left out unless other lazy attributes depend on
+        them.
+        """
+        eager = lazy
+        if method == 'build' and self._build_class() is self._lazy_class:
+            own   = self._deferred
+            eager = [(k, v) for k, v in lazy if own.get(k) is not v]
+        resolver = _LazyResolver(attrs, dict(lazy))
+        for key, val in eager:
+            getattr(resolver, key)
+
+    def _plan(self, overrides):
+        """
+        Merges the given overrides into the compiled build plan.
 
-        vals -- A tuple in the form (key, value) representing a single
-        attribute of the model.
-        returns -- A tuple in the form (key, value)
+        overrides -- a dictionary with the overridden attributes. Keys, which
+        aren't attributes of the factory, are ignored.
+        returns -- a tuple (static, dynamic, lazy) in the form of the
+        compiled plan.
         """
-        key = vals[0]
-        val = vals[1]
+        if not overrides:
+            return self._static, self._dynamic, self._lazy
+
+        static  = self._static.copy()
+        dynamic = [(k, v) for k, v in self._dynamic if k not in overrides]
+        lazy    = [(k, v) for k, v in self._lazy if k not in overrides]
+        for key, val in overrides.iteritems():
+            if key not in self._keys:
+                continue
+            static.pop(key, None)
+            if isinstance(val, LazyAttribute):
+                lazy.append((key, val))
+            elif isinstance(val, FactoryAttribute):
+                dynamic.append((key, val))
+            else:
+                static[key] = val
+        return static, dynamic, lazy
 
-        if key in self._override:
-            val = self._override[key]
+    def _iter_attributes(self, method, n, overrides):
+        """
+        Returns an iterator over n attribute-dictionaries. Overrides marked by
+        each() contain one value per object, all other overrides are used for
+        every object.
 
-        if not isinstance(val, FactoryAttribute):
-            return (key, val)
-        return (key, val(self._method))
+        method -- the name of the method ('build', 'create', ...), which is
+        passed to the special attributes.
+        n -- the number of dictionaries to generate, None for an endless
+        iterator.
+        overrides -- a dictionary with the overridden attributes.
+        """
+        scalars, sequences = self._split_overrides(n, overrides)
+        static, dynamic, lazy = self._plan(scalars)
+        if sequences:
+            keys    = frozenset(k for k, v in sequences)
+            dynamic = [(k, v) for k, v in dynamic if k not in keys]
+            lazy    = [(k, v) for k, v in lazy if k not in keys]
+        return self._generate(method, n, static, dynamic, lazy, sequences)
+
+    def _split_overrides(self, n, overrides):
+        """
+        Splits the overrides into the ones used for every object and the ones
+        marked by each(), which contain one value per object.
+
+        returns -- a tuple (scalars, sequences) of a dictionary and a list of
+        (key, values) pairs.
+        """
+        scalars   = {}
+        sequences = []
+        for key, val in overrides.iteritems():
+            if not isinstance(val, Each):
+                scalars[key] = val
+            elif n is None:
+                raise FactoryException(
+                    "Override '%s' has a value per object, but n is not "
+                    "given!" % key
+                )
+            elif len(val) != n:
+                raise FactoryException(
+                    "Override '%s' has %d values, expected %d!" % (
+                        key, len(val), n
+                    )
+                )
+            elif key in self._keys:
+                sequences.append((key, val.values))
+        return scalars, sequences
+
+    def _generate(self, method, n, static, dynamic, lazy, sequences):
+        """
+        Yields the attribute-dictionaries for _iter_attributes.
+        """
+        indices = xrange(n) if n is not None else itertools.count()
+        scope   = _current_scope() or BuildScope()
+        for i in indices:
+            previous = _current_scope()
+            _scopes.current = scope
+            try:
+                attrs = static.copy()
+                for key, val in dynamic:
+                    attrs[key] = val(method)
+                for key, vals in sequences:
+                    val = vals[i]
+                    if isinstance(val, FactoryAttribute):
+                        val = val(method)
+                    attrs[key] = val
+                if lazy:
+                    self._resolve_lazy(method, attrs, lazy)
+            finally:
+                _scopes.current = previous
+            yield attrs
+
+    def _attributes_batch(self, method, n, overrides):
+        """
+        Returns an iterator over n attribute-dictionaries. Unlike
+        _iter_attributes the special attributes are evaluated column by column
+        through their batch method, which lets them generate their values in
+        bulk. The columns are evaluated right away, the dictionaries are
+        assembled while iterating, so they needn't be kept in memory at once.
+        """
+        scalars, sequences = self._split_overrides(n, overrides)
+        static, dynamic, lazy = self._plan(scalars)
+        keys  = frozenset(k for k, v in sequences)
+        lazy  = [(k, v) for k, v in lazy if k not in keys]
+        scope = _current_scope() or BuildScope()
+
+        with _activate(scope):
+            columns = [
+                (key, val.batch(method, n))
+                for key, val in dynamic if key not in keys
+            ]
+            for key, vals in sequences:
+                columns.append((key, [
+                    v(method) if isinstance(v, FactoryAttribute) else v
+                    for v in vals
+                ]))
+        return self._assemble(method, n, static, columns, lazy, scope)
+
+    def _assemble(self, method, n, static, columns, lazy, scope):
+        """
+        Yields the attribute-dictionaries for _attributes_batch.
+        """
+        for i in xrange(n):
+            attrs = static.copy()
+            for key, column in columns:
+                attrs[key] = column[i]
+            if lazy:
+                with _activate(scope):
+                    self._resolve_lazy(method, attrs, lazy)
+            yield attrs
 
     def build(self, **kwargs):
         """
@@ -159,9 +746,36 @@ class FactoryElement(object):
 
         returns -- the built object is returned.
         """
-        klass = self._fetch_class()
+        klass = self._constructor(self._build_class(), kwargs)
         return klass(**self.attributes_for('build', **kwargs))
 
+    def build_batch(self, n, **kwargs):
+        """
+        Builds n objects using the given meta-data.
+
+        returns -- a list with the built objects is returned.
+        """
+        klass = self._constructor(self._build_class(), kwargs)
+        return [
+            klass(**attrs)
+            for attrs in self._attributes_batch('build', n, kwargs)
+        ]
+
+    def iter_build(self, n=None, chunk_size=None, **kwargs):
+        """
+        Lazily builds objects using the given meta-data.
+
+        n -- the number of objects, None for an endless iterator.
+        chunk_size -- if given, lists of chunk_size objects are yielded.
+        returns -- an iterator over the built objects.
+        """
+        klass = self._constructor(self._build_class(), kwargs)
+        objs  = itertools.imap(
+            lambda attrs: klass(**attrs),
+            self._iter_attributes('build', n, kwargs)
+        )
+        return _chunked(objs, chunk_size)
+
     def attributes_for(self, method='attributes_for', **kwargs):
         """
         Returns an attribute-dictionary for the model-class.
@@ -169,9 +783,73 @@ class FactoryElement(object):
         returns -- A dictionary containing all attributes of the class is
         returned.
         """
-        self._method = method
-        self._override = kwargs
-        return dict(map(self._filter_attributes, self.attributes.items()))
+        static, dynamic, lazy = self._plan(kwargs)
+        attrs = static.copy()
+        for key, val in dynamic:
+            attrs[key] = val(method)
+        if lazy:
+            self._resolve_lazy(method, attrs, lazy)
+        return attrs
+
+    def attributes_for_batch(self, n, **kwargs):
+        """
+        Returns n attribute-dictionaries for the model-class.
+
+        returns -- A list of dictionaries is returned.
+        """
+        return list(self._attributes_batch('attributes_for', n, kwargs))
+
+    def iter_attributes(self, n=None, chunk_size=None, **kwargs):
+        """
+        Lazily generates attribute-dictionaries for the model-class.
+
+        n -- the number of dictionaries, None for an endless iterator.
+        chunk_size -- if given, lists of chunk_size dictionaries are yielded.
+        returns -- an iterator over the dictionaries.
+        """
+        attrs = self._iter_attributes('attributes_for', n, kwargs)
+        return _chunked(attrs, chunk_size)
+
+    def columns(self, n, numpy=False, **kwargs):
+        """
+        Returns the attributes of n objects in columnar form: one column per
+        attribute. Static attributes are returned as ConstantColumn, the
+        special attributes are generated in bulk through their batch method.
+
+        numpy -- if True, the columns are converted into NumPy arrays.
+        returns -- a dictionary with the columns.
+        """
+        scalars, sequences = self._split_overrides(n, kwargs)
+        static, dynamic, lazy = self._plan(scalars)
+        keys = frozenset(k for k, v in sequences)
+        lazy = [(k, v) for k, v in lazy if k not in keys]
+
+        columns = {}
+        for key, val in static.iteritems():
+            if key not in keys:
+                columns[key] = ConstantColumn(val, n)
+        with _activate(_current_scope() or BuildScope()):
+            for key, val in dynamic:
+                if key not in keys:
+                    columns[key] = val.batch('attributes_for', n)
+            for key, vals in sequences:
+                columns[key] = [
+                    v('attributes_for') if isinstance(v, FactoryAttribute) else v
+                    for v in vals
+                ]
+
+        if lazy:
+            values = dict((key, []) for key, val in lazy)
+            for i in xrange(n):
+                attrs = dict((k, c[i]) for k, c in columns.iteritems())
+                self._resolve_lazy('attributes_for', attrs, lazy)
+                for key, column in values.iteritems():
+                    column.append(attrs[key])
+            columns.update(values)
+
+        if numpy:
+            return to_numpy(columns)
+        return columns
 
     def create(self, **kwargs):
         """
@@ -179,44 +857,164 @@ class FactoryElement(object):
 
         returns -- the created object is returned.
         """
-        klass = self._fetch_class()
-        obj = klass(**self.attributes_for('create', **kwargs))
+        klass   = self._fetch_class()
+        make    = self._constructor(klass, kwargs)
+        session = _current_session()
+        with _creating(klass, session):
+            obj = make(**self.attributes_for('create', **kwargs))
+        if session is None:
+            backend = pyfactory.backend()
+            backend.save(obj)
+            _created.add(klass, [obj], backend)
+            return obj
 
-        save_name = pyfactory.save_function()
-        getattr(obj, save_name)() # calls save/put on obj 
+        session.add(klass, [obj])
         return obj
+
+    def create_batch(self, n, **kwargs):
+        """
+        Creates n objects using the given meta-data. The objects are saved
+        in chunks through the save_batch method of the backend.
+
+        returns -- a list with the created objects is returned.
+        """
+        klass   = self._fetch_class()
+        make    = self._constructor(klass, kwargs)
+        session = _current_session()
+        with _creating(klass, session):
+            rows = self._attributes_batch('create', n, kwargs)
+        if session is not None:
+            objs = [make(**attrs) for attrs in rows]
+            session.add(klass, objs)
+            return objs
+
+        backend = pyfactory.backend()
+        objs    = []
+        chunk   = []
+        for attrs in rows:
+            chunk.append(make(**attrs))
+            if len(chunk) >= backend.chunk_size:
+                backend.save_batch(chunk)
+                _created.add(klass, chunk, backend)
+                objs.extend(chunk)
+                chunk = []
+        if chunk:
+            backend.save_batch(chunk)
+            _created.add(klass, chunk, backend)
+            objs.extend(chunk)
+        return objs
+
+    def create_concurrent(self, n, concurrency=8, **kwargs):
+        """
+        Creates n objects using the given meta-data in a pool of concurrency
+        threads, so that the saves (including the ones of Foreign attributes)
+        overlap.
+
+        Within a session nothing is saved, so the objects are created by
+        create_batch instead.
+
+        returns -- a list with the created objects is returned.
+        """
+        if _current_session() is not None:
+            return self.create_batch(n, **kwargs)
+
+        scalars, sequences = self._split_overrides(n, kwargs)
+        scope = _current_scope() or BuildScope()
+
+        def create(i):
+            overrides = scalars.copy()
+            for key, vals in sequences:
+                overrides[key] = vals[i]
+            with _activate(scope):
+                return self.create(**overrides)
+
+        pool = ThreadPool(concurrency)
+        try:
+            return pool.map(create, xrange(n))
+        finally:
+            pool.close()
+            pool.join()
         
 class FactoryInitializer(type):
     """
     A metaclass, which is responsible for fetching the metadata on the
     FactoryObject-classes and creating FactoryElement-instances and adding them
     to the global factory object.
+
+    Factories may derive from other factories and their 'Elements' from the
+    'Elements' of other factories. The inherited attributes are flattened
+    into a single table when the class is created, so inheritance adds no
+    cost to building objects. A 'Meta'-class without a name marks an
+    abstract factory, which is not registered.
     """
     def __init__(cls, name, bases, dict):
+        cls._attributes = cls._collect_attributes(bases, dict)
+        cls._klass      = cls._collect_meta(bases, dict, 'klass', None)
+        cls._prototype  = cls._collect_meta(bases, dict, 'prototype', False)
+        cls._record     = cls._collect_meta(bases, dict, 'record', False)
         if 'Meta' in dict:
-            attrs = cls._collect_attributes(dict)
+            name = dict['Meta'].__dict__.get('name')
+            if name is None:
+                return
+            if cls._klass is None and not cls._record:
+                raise FactoryException(
+                    "The Factory %s has no klass!" % name
+                )
             Factory._add_factory(FactoryElement(
-                dict['Meta'].name, 
-                dict['Meta'].klass,
-                attrs
+                name,
+                cls._klass,
+                cls._attributes,
+                cls._prototype,
+                cls._record,
+                cls._source()
             ))
-    
-    def _collect_attributes(cls, d):
+
+    def _source(cls):
+        """
+        Returns a tuple (path, class name) identifying the definition of the
+        factory, or None if the file of its module is unknown.
+        """
+        module = sys.modules.get(cls.__module__)
+        path   = getattr(module, '__file__', None)
+        if path is None:
+            return None
+        path = os.path.realpath(os.path.splitext(path)[0])
+        return (path, cls.__name__)
+
+    def _collect_meta(cls, bases, d, key, default):
+        """
+        Returns the option key (klass, prototype or record) of the 'Meta'
+        nested-class or the option inherited from the base factories.
+        """
+        if 'Meta' in d and hasattr(d['Meta'], key):
+            return getattr(d['Meta'], key)
+        for base in bases:
+            value = getattr(base, '_' + key, None)
+            if value is not None:
+                return value
+        return default
+
+    def _collect_attributes(cls, bases, d):
         """
         Returns a dictionary with all key-value pairs in the 'Elements'
-        nested-class.
+        nested-class, its base classes and the base factories.
         """
+        attrs = {}
+        for base in reversed(bases):
+            attrs.update(getattr(base, '_attributes', {}))
+
         if 'Elements' not in d:
-            return {}
+            return attrs
 
-        keys = filter(
-            lambda k: not k.startswith('__'), 
-            d['Elements'].__dict__.keys()
-        )
-        vals = map(lambda k: (k, getattr(d['Elements'], k)), keys)
-        return dict(vals)
+        for elements in reversed(inspect.getmro(d['Elements'])):
+            if elements is object:
+                continue
+            attrs.update(
+                (k, getattr(elements, k)) for k in elements.__dict__
+                if not k.startswith('__')
+            )
+        return attrs
 
-        
 class FactoryObject(object):
     """
     Derive your actual Factory-classes from this class, which simply injects
@@ -224,12 +1022,364 @@ class FactoryObject(object):
     """
     __metaclass__ = FactoryInitializer
 
+# =================================================================
+# Build scopes
+# =================================================================
+
+_scopes = threading.local()
+
+def _current_scope():
+    """
+    Returns the active BuildScope of the current thread or None.
+    """
+    return getattr(_scopes, 'current', None)
+
+@contextlib.contextmanager
+def _activate(scope):
+    """
+    Activates the given BuildScope in the current thread for the with-block.
+    """
+    previous = _current_scope()
+    _scopes.current = scope
+    try:
+        yield scope
+    finally:
+        _scopes.current = previous
+
+class BuildScope(object):
+    """
+    Memoizes the objects of Foreign attributes with a sharing policy. A scope
+    is active during a single batch (or iterator) and within the with-block
+    of Factory.scope(). A scope may be shared by several threads.
+    """
+    def __init__(self):
+        self._memo = {}
+        self._lock = threading.RLock()
+
+    def next(self, foreign, type):
+        """
+        Returns the next object for the given Foreign attribute, either a
+        newly created one or one of the shared objects.
+        """
+        key = (id(foreign), type)
+        with self._lock:
+            state = self._memo.get(key)
+            if state is None:
+                objs = []
+                if foreign.objects is not None:
+                    objs = foreign.objects
+                    objs = list(objs() if callable(objs) else objs)
+                    if not objs:
+                        raise FactoryException(
+                            "No objects to share for '%s'!" % foreign.factory_name
+                        )
+                state = self._memo[key] = [objs, 0]
+
+            objs, index = state
+            state[1] = index + 1
+            if foreign.objects is None and len(objs) < foreign.pool:
+                objs.append(foreign._make(type))
+                return objs[-1]
+            return objs[index % len(objs)]
+
+# =================================================================
+# Sessions
+# =================================================================
+
+_sessions = threading.local()
+
+def _current_session():
+    """
+    Returns the active Session of the current thread or None.
+    """
+    return getattr(_sessions, 'current', None)
+
+class _Recorder(object):
+    """
+    Records objects grouped by their class together with the dependencies
+    between the classes: objects of a class, which are created while an
+    object of another class is created (i.e. Foreign objects), must be saved
+    before and deleted after the objects of the other class.
+    """
+    def __init__(self):
+        self._records      = []
+        self._dependencies = {}
+        self._stack        = threading.local()
+        self._lock         = threading.Lock()
+
+    @contextlib.contextmanager
+    def recording(self, klass):
+        """
+        Marks the with-block as creating an object of the given klass.
+        Objects created within the block are dependencies of klass.
+        """
+        stack = self._stack.__dict__.setdefault('classes', [])
+        if stack and stack[-1] is not klass:
+            with self._lock:
+                self._dependencies.setdefault(stack[-1], set()).add(klass)
+        stack.append(klass)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def add(self, klass, items):
+        """
+        Records the given items (usually objects) of klass.
+        """
+        with self._lock:
+            self._records.append((klass, items))
+
+    def __len__(self):
+        return sum(len(items) for klass, items in self._records)
+
+    def _take_groups(self):
+        """
+        Forgets the recorded items and returns them as a list of
+        (klass, items)-tuples in the order, in which the objects must be
+        saved. If the dependencies between the classes are cyclic,
+        consecutive items of the same class are grouped only.
+        """
+        with self._lock:
+            records, self._records = self._records, []
+            dependencies = dict(
+                (k, set(v)) for k, v in self._dependencies.iteritems()
+            )
+
+        grouped = {}
+        classes = []
+        for klass, items in records:
+            if klass not in grouped:
+                grouped[klass] = []
+                classes.append(klass)
+            grouped[klass].extend(items)
+
+        order = []
+        state = {}
+        def visit(klass):
+            if state.get(klass) == 'done':
+                return True
+            if state.get(klass) == 'visiting':
+                return False
+            state[klass] = 'visiting'
+            for dependency in classes:
+                if dependency in dependencies.get(klass, ()):
+                    if not visit(dependency):
+                        return False
+            state[klass] = 'done'
+            order.append(klass)
+            return True
+
+        if all(visit(klass) for klass in classes):
+            return [(klass, grouped[klass]) for klass in order]
+
+        groups = []
+        for klass, items in records:
+            if groups and groups[-1][0] is klass:
+                groups[-1][1].extend(items)
+            else:
+                groups.append((klass, list(items)))
+        return groups
+
+class Session(_Recorder):
+    """
+    A unit of work: records the objects created within the with-block of
+    Factory.session() instead of saving them. On flush the objects are saved
+    grouped by class, the classes of Foreign objects before the classes
+    referring to them.
+    """
+    def flush(self, backend):
+        """
+        Saves all recorded objects through the save_batch method of the
+        given backend and forgets them. Objects, which other objects refer
+        to, need their keys, so they are saved one by one if save_batch
+        doesn't set the keys (see Backend.returns_keys).
+        """
+        with self._lock:
+            referenced = set()
+            for classes in self._dependencies.itervalues():
+                referenced.update(classes)
+        for klass, objs in self._take_groups():
+            single = klass in referenced and not backend.returns_keys(klass)
+            for chunk in _chunked(iter(objs), backend.chunk_size):
+                if single:
+                    for obj in chunk:
+                        backend.save(obj)
+                else:
+                    backend.save_batch(chunk)
+                _created.add(klass, chunk, backend)
+
+@contextlib.contextmanager
+def _creating(klass, session=None):
+    """
+    Marks the with-block as creating an object of the given klass for the
+    created objects and the session (if given).
+    """
+    with _created.recording(klass):
+        if session is None:
+            yield
+        else:
+            with session.recording(klass):
+                yield
+
+# =================================================================
+# Created objects
+# =================================================================
+
+class CreatedObjects(_Recorder):
+    """
+    Keeps track of the objects saved by the factories, so that they can be
+    deleted again by Factory.cleanup(). Tracking is disabled unless enabled
+    by Factory.track() or within the with-block of Factory.tracking().
+
+    The objects are referenced weakly together with their key in the
+    datastore (see Backend.key): objects, which are still alive, are deleted
+    through delete_batch, the others by their keys through delete_keys.
+    Objects without a key can't be deleted after they were garbage
+    collected, so they are forgotten then.
+    """
+    def __init__(self):
+        _Recorder.__init__(self)
+        self.enabled = False
+        self._blocks = 0
+        self._size   = 0
+        self._dead   = 0
+
+    @property
+    def active(self):
+        return self.enabled or self._blocks > 0
+
+    @contextlib.contextmanager
+    def block(self):
+        """
+        Tracks the objects created during the with-block.
+        """
+        with self._lock:
+            self._blocks += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._blocks -= 1
+
+    @contextlib.contextmanager
+    def recording(self, klass):
+        if not self.active:
+            yield
+            return
+        with _Recorder.recording(self, klass):
+            yield
+
+    def _collected(self, ref):
+        self._dead += 1
+
+    def add(self, klass, objs, backend):
+        """
+        Records the given objects of klass, which were saved by backend.
+        """
+        if not self.active:
+            return
+        keyed   = backend.key.im_func is not pyfactory.Backend.key.im_func
+        entries = []
+        for obj in objs:
+            key = backend.key(obj)
+            if key is None and keyed:
+                warnings.warn(
+                    "The backend returned no key for a %s, it can't be "
+                    "deleted once it was garbage collected!" % klass.__name__,
+                    RuntimeWarning
+                )
+            try:
+                ref = weakref.ref(obj, self._collected if key is None else None)
+            except TypeError:
+                ref = None
+            if ref is not None or key is not None:
+                entries.append((ref, key))
+        _Recorder.add(self, klass, entries)
+        self._size += len(entries)
+        if self._dead > 1000 and self._dead * 2 > self._size:
+            self._compact()
+
+    def _compact(self):
+        """
+        Forgets the garbage collected objects without a key.
+        """
+        with self._lock:
+            records = []
+            for klass, entries in self._records:
+                entries = [
+                    (ref, key) for ref, key in entries
+                    if key is not None or ref() is not None
+                ]
+                if entries:
+                    records.append((klass, entries))
+            self._records = records
+            self._size    = len(self)
+            self._dead    = 0
+
+    def delete(self, backend):
+        """
+        Deletes all recorded objects through the given backend, grouped by
+        class and in the reverse order of their dependencies, and forgets
+        them. If the backend raises an exception, the objects, which weren't
+        deleted yet, are kept, so that the cleanup can be retried.
+        """
+        pending = list(reversed(self._take_groups()))
+        self._size = 0
+        self._dead = 0
+        try:
+            while pending:
+                klass, entries = pending[0]
+                objs = []
+                keys = []
+                for ref, key in entries:
+                    obj = ref() if ref is not None else None
+                    if obj is not None:
+                        objs.append((obj, (ref, key)))
+                    elif key is not None:
+                        keys.append((ref, key))
+                while objs:
+                    chunk = objs[:backend.chunk_size]
+                    backend.delete_batch([obj for obj, entry in chunk])
+                    del objs[:len(chunk)]
+                    pending[0] = (klass, [e for o, e in objs] + keys)
+                while keys:
+                    chunk = keys[:backend.chunk_size]
+                    backend.delete_keys(klass, [key for ref, key in chunk])
+                    del keys[:len(chunk)]
+                    pending[0] = (klass, keys)
+                pending.pop(0)
+        finally:
+            for klass, entries in reversed(pending):
+                if entries:
+                    _Recorder.add(self, klass, entries)
+                    self._size += len(entries)
+
+_created = CreatedObjects()
+
 # =================================================================
 # Attributes
 # =================================================================
 
 class FactoryAttribute(object):
-    pass
+    """
+    Base class of the special attributes. Derived classes must implement
+    __call__, which returns the value of the attribute for a single object.
+    """
+    def batch(self, type, n):
+        """
+        Returns a list with the values of the attribute for n objects.
+        Override this method if the values can be generated in bulk.
+        """
+        return [self(type) for i in xrange(n)]
+
+    def bind(self, factory_name, key):
+        """
+        Called when the attribute is compiled into the factory with the given
+        name. Returns the attribute to use in the factory, which may be a
+        copy holding per-factory state.
+        """
+        return self
         
 class Generator(FactoryAttribute):
     """
@@ -243,28 +1393,390 @@ class Generator(FactoryAttribute):
     def __call__(self, type):
         return self._callback(UniqueIDGenerator.generate())
 
+    def batch(self, type, n):
+        return map(self._callback, UniqueIDGenerator.generate_range(n))
+
 class Foreign(FactoryAttribute):
     """
     Allows to use a Factory for the attribute. The name of the Factory to use
     must be given to the constructor of the object.
+
+    By default every object gets its own foreign object. Within a build scope
+    (a batch, an iterator or Factory.scope()) the objects can be shared:
+
+    shared -- if True, a single object is shared by all objects.
+    pool -- the number of objects, which are created and then handed out
+    round-robin.
+    objects -- a list of existing objects (or a callable returning one),
+    which are handed out round-robin instead of creating new objects.
     """
-    def __init__(self, factory_name):
+    def __init__(self, factory_name, shared=False, pool=None, objects=None):
         self.factory_name = factory_name
+        self.pool         = 1 if shared else pool
+        self.objects      = objects
 
-    def __call__(self, type):
+    def _make(self, type):
         method = getattr(Factory, type)
         # e.g. Factory.build('user')
         return method(self.factory_name)
+
+    def __call__(self, type):
+        if self.pool is None and self.objects is None:
+            return self._make(type)
+        return (_current_scope() or BuildScope()).next(self, type)
     
+class Sequence(FactoryAttribute):
+    """
+    Generates consecutive values start, start + step, start + 2 * step, ...
+    and passes them to the callback (if given). Every attribute of every
+    factory has its own counter, unless a name is given: Sequences with the
+    same name share a counter.
+
+    callback -- a function, which formats a single value.
+    vectorized -- if True, the callback gets a list of values and must
+    return a list with the formatted values, which lets the batch methods
+    format all values in one call.
+    """
+    counters = {}
+    _lock    = threading.Lock()
+
+    def __init__(self, callback=None, start=1, step=1, name=None,
+                 vectorized=False):
+        if not step:
+            raise FactoryException("The step of a Sequence must not be 0!")
+        self._callback  = callback
+        self.start      = start
+        self.step       = step
+        self.name       = name
+        self.vectorized = vectorized
+        self._counter   = None if name else LocalCounter()
+        if name:
+            self._named(name)
+
+    @classmethod
+    def _named(cls, name):
+        """
+        Returns the counter of the sequence with the given name.
+        """
+        with cls._lock:
+            counter = cls.counters.get(name)
+            if counter is None:
+                counter = cls.counters[name] = LocalCounter()
+        return counter
+
+    @classmethod
+    def reset(cls, name=None):
+        """
+        Resets the sequence with the given name or all named sequences, so
+        that they start again with their start value.
+        """
+        names = [name] if name is not None else cls.counters.keys()
+        for name in names:
+            cls._named(name).reset()
+
+    def bind(self, factory_name, key):
+        if self.name is not None:
+            return self
+        bound = copy.copy(self)
+        bound.name     = '%s.%s' % (factory_name, key)
+        bound._counter = None
+        self._named(bound.name)
+        return bound
+
+    def _allocate(self, n):
+        """
+        Allocates n values. The counters of named sequences are looked up on
+        each call, so that they can be replaced (see parallel.generate).
+        """
+        counter = self._counter
+        if counter is None:
+            counter = self.counters.get(self.name) or self._named(self.name)
+        return counter.allocate(n)
+
+    def __call__(self, type):
+        value = self.start + self._allocate(1) * self.step
+        if self._callback is None:
+            return value
+        if self.vectorized:
+            return self._callback([value])[0]
+        return self._callback(value)
+
+    def batch(self, type, n):
+        start  = self.start + self._allocate(n) * self.step
+        values = xrange(start, start + n * self.step, self.step)
+        if self._callback is None:
+            return list(values)
+        if self.vectorized:
+            return self._callback(values)
+        return map(self._callback, values)
+
+class LazyAttribute(FactoryAttribute):
+    """
+    An attribute, whose value is computed by the given callback only when it
+    is needed. The callback gets the object as argument and may access its
+    other attributes (including other lazy ones), so dependent attributes are
+    evaluated in dependency order:
+
+    email = LazyAttribute(lambda obj: '%s@example.com' % obj.name)
+
+    build evaluates the attribute on first access and caches the result in
+    the object. create and attributes_for evaluate it eagerly.
+    """
+    def __init__(self, callback):
+        self._callback = callback
+
+    def __call__(self, type):
+        raise FactoryException("LazyAttribute needs the other attributes!")
+
+class _LazyResolver(object):
+    """
+    Gives the callbacks of lazy attributes access to the other attributes of
+    an attribute-dictionary. Pending lazy attributes are evaluated on demand
+    and stored in the dictionary.
+    """
+    def __init__(self, attrs, pending):
+        self._attrs     = attrs
+        self._pending   = pending
+        self._resolving = set()
+
+    def __getattr__(self, key):
+        attrs = self._attrs
+        if key in self._pending and key not in attrs:
+            if key in self._resolving:
+                raise FactoryException(
+                    "Lazy attribute '%s' depends on itself!" % key
+                )
+            self._resolving.add(key)
+            try:
+                attrs[key] = self._pending[key]._callback(self)
+            finally:
+                self._resolving.discard(key)
+        try:
+            return attrs[key]
+        except KeyError:
+            raise AttributeError(key)
+
+class _LazyDescriptor(object):
+    """
+    Evaluates a lazy attribute on first access and stores the result in the
+    instance, which hides the descriptor afterwards.
+    """
+    def __init__(self, key, attribute):
+        self.key        = key
+        self.attribute  = attribute
+        self._resolving = threading.local()
+
+    def __get__(self, obj, owner):
+        if obj is None:
+            return self
+        resolving = self._resolving.__dict__.setdefault('ids', set())
+        if id(obj) in resolving:
+            raise FactoryException(
+                "Lazy attribute '%s' depends on itself!" % self.key
+            )
+        resolving.add(id(obj))
+        try:
+            value = self.attribute._callback(obj)
+        finally:
+            resolving.discard(id(obj))
+        setattr(obj, self.key, value)
+        return value
+
+_IMMUTABLE = (
+    type(None), bool, int, long, float, complex, basestring, tuple, frozenset,
+    type, datetime.date, datetime.time, datetime.timedelta, decimal.Decimal
+)
+
+class _Prototype(object):
+    """
+    A template instance of a model-class, which is constructed once by
+    calling the constructor. Clones get a copy of its __dict__ without
+    calling the constructor again. Mutable values are copied (shallow) for
+    every clone, so that the clones never share e.g. a list with the
+    template or with each other.
+    """
+    def __init__(self, klass, attrs):
+        if not isinstance(klass, type):
+            raise FactoryException(
+                "The prototype mode needs a new-style class, not %r!" % klass
+            )
+        template = klass(**attrs)
+        if not hasattr(template, '__dict__'):
+            raise FactoryException(
+                "The prototype mode needs instances with a __dict__!"
+            )
+        self.klass = klass
+        self.state = template.__dict__.copy()
+
+    def constructor(self, patched):
+        """
+        Returns a function, which clones the template and assigns the values
+        of the given patched keys from the attribute-dictionary.
+        """
+        klass  = self.klass
+        shared = dict(
+            (k, v) for k, v in self.state.iteritems()
+            if k not in patched and isinstance(v, _IMMUTABLE)
+        )
+        copied = [
+            (k, v) for k, v in self.state.iteritems()
+            if k not in patched and not isinstance(v, _IMMUTABLE)
+        ]
+
+        def construct(**attrs):
+            obj   = klass.__new__(klass)
+            state = obj.__dict__
+            state.update(shared)
+            for key, val in copied:
+                state[key] = copy.copy(val)
+            for key, val in attrs.iteritems():
+                if key in patched:
+                    setattr(obj, key, val)
+            return obj
+        return construct
+
+def _record_class(factory_name, fields):
+    """
+    Generates a class with __slots__ for the given fields, whose instances
+    take a fraction of the memory of ordinary objects. The records are
+    mutable, compare equal if their values are equal and are pickled by the
+    name of the factory.
+    """
+    namespace = {}
+    exec 'def __init__(self, %s):%s' % (
+        ', '.join('%s=None' % f for f in fields),
+        ''.join('\n    self.%s = %s' % (f, f) for f in fields) or '\n    pass'
+    ) in namespace
+
+    def _astuple(self):
+        return tuple(getattr(self, f) for f in fields)
+
+    def _asdict(self):
+        return dict((f, getattr(self, f)) for f in fields)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and _astuple(self) == _astuple(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (f, getattr(self, f)) for f in fields
+        ))
+
+    def __reduce__(self):
+        return (_unpickle_record, (factory_name, _asdict(self)))
+
+    name = ''.join(p.capitalize() for p in factory_name.split('_')) + 'Record'
+    return type(name.encode('ascii', 'replace'), (object,), {
+        '__slots__':   tuple(fields),
+        '__init__':    namespace['__init__'],
+        '__eq__':      __eq__,
+        '__ne__':      __ne__,
+        '__hash__':    None,
+        '__repr__':    __repr__,
+        '__reduce__':  __reduce__,
+        '_fields':     tuple(fields),
+        '_asdict':     _asdict,
+    })
+
+def _unpickle_record(factory_name, attrs):
+    """
+    Recreates a pickled record of the factory with the given name.
+    """
+    return Factory._find_factory(factory_name)._build_class()(**attrs)
+
+def _init_arguments(klass):
+    """
+    Returns the names of the explicit arguments of the constructor of klass.
+    """
+    try:
+        return frozenset(inspect.getargspec(klass.__init__).args[1:])
+    except TypeError:
+        return frozenset()
+
+def _lazy_subclass(klass, lazy):
+    """
+    Generates a subclass of klass, which evaluates the given lazy attributes
+    on first access. Its instances are pickled as instances of klass. If the
+    constructor of klass assigns one of the attributes anyway, which would
+    hide the descriptor, the attribute is evaluated right after construction
+    unless it was passed to the constructor (i.e. overridden).
+    """
+    keys = [k for k, v in lazy]
+
+    def __init__(self, *args, **kwargs):
+        klass.__init__(self, *args, **kwargs)
+        state = self.__dict__
+        for key in keys:
+            if key in state and key not in kwargs:
+                del state[key]
+                getattr(self, key)
+
+    def __reduce_ex__(self, protocol):
+        for key in keys:
+            getattr(self, key)
+        reduced = klass.__reduce_ex__(self, protocol)
+        args = tuple(klass if a is subclass else a for a in reduced[1])
+        return (reduced[0], args) + tuple(reduced[2:])
+
+    attrs = dict((k, _LazyDescriptor(k, v)) for k, v in lazy)
+    attrs['__module__']    = klass.__module__
+    attrs['__init__']      = __init__
+    attrs['__reduce_ex__'] = __reduce_ex__
+    subclass = type(klass.__name__, (klass,), attrs)
+    return subclass
+
 class UniqueIDGenerator(object):
     """
-    Helperclass which creates unique integer-ids by simply incrementing a
-    global variable.
+    Helperclass which creates unique integer-ids. Every thread takes a block
+    of block_size ids from the shared counter in a single step and hands them
+    out locally.
+
+    By default the ids are only unique within the current process. Assign a
+    SharedMemoryCounter (multiprocessing) or a FileCounter (independent
+    processes, or set PYFACTORY_ID_FILE) through reset to get unique ids
+    across processes.
     """
+    block_size = 100
+    counter    = default_counter()
+    _local     = threading.local()
+
     @classmethod
     def generate(cls):
-        if 'id' not in cls.__dict__:
-            cls.id = 0
-        cls.id += 1
-        return cls.id
-        
+        local = cls._local
+        try:
+            next_id = local.next
+            if next_id < local.end:
+                local.next = next_id + 1
+                return next_id
+        except AttributeError:
+            pass
+        start = cls.counter.allocate(cls.block_size) + 1
+        local.next = start + 1
+        local.end  = start + cls.block_size
+        return start
+
+    @classmethod
+    def generate_range(cls, n):
+        """
+        Takes n consecutive ids directly from the counter.
+
+        returns -- an xrange with the ids.
+        """
+        start = cls.counter.allocate(n) + 1
+        return xrange(start, start + n)
+
+    @classmethod
+    def reset(cls, counter=None):
+        """
+        Discards the blocks of all threads and optionally replaces the
+        counter.
+        """
+        if counter is not None:
+            cls.counter = counter
+        cls._local = threading.local()
+
+# forked processes must not hand out the remaining ids of the parent's blocks
+register_after_fork(UniqueIDGenerator, lambda cls: cls.reset())
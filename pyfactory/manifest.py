@@ -0,0 +1,91 @@
+import os
+import ast
+import json
+
+# =========================================================================== 
+# Factory manifests
+# =========================================================================== 
+#
+# A manifest maps the names of the factories to the modules defining them,
+# so that a module is imported only when one of its factories is used. The
+# manifest is generated by a static scan of the source files, which imports
+# nothing.
+
+def _module_name(path, root):
+    """
+    Returns the dotted name of the module in the file with the given path
+    relative to the directory root.
+    """
+    parts = os.path.splitext(os.path.relpath(path, root))[0].split(os.sep)
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+def _factory_names(tree):
+    """
+    Yields the names of the factories defined at module level of the given
+    syntax tree: classes with a nested 'Meta'-class, which assigns a string
+    to 'name'.
+    """
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for meta in node.body:
+            if not isinstance(meta, ast.ClassDef) or meta.name != 'Meta':
+                continue
+            for assign in meta.body:
+                if not isinstance(assign, ast.Assign):
+                    continue
+                targets = [t.id for t in assign.targets
+                           if isinstance(t, ast.Name)]
+                if 'name' in targets and isinstance(assign.value, ast.Str):
+                    yield assign.value.s
+
+def _source_files(paths):
+    """
+    Yields the python files in the given files and directories.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    yield os.path.join(directory, name)
+
+def scan(paths, root='.'):
+    """
+    Scans the given files and directories for factories.
+
+    paths -- a list of python files and directories.
+    root -- the directory on sys.path, which the module names are relative
+    to.
+    returns -- a dictionary mapping the names of the factories to the names
+    of the modules.
+    """
+    manifest = {}
+    for path in _source_files(paths):
+        with open(path) as source:
+            tree = ast.parse(source.read(), path)
+        module = _module_name(path, root)
+        for name in _factory_names(tree):
+            manifest[name] = module
+    return manifest
+
+def write(manifest, fileobj):
+    """
+    Writes the manifest as JSON to the given file-like object.
+    """
+    json.dump(
+        manifest, fileobj, indent=2, sort_keys=True, separators=(',', ': ')
+    )
+    fileobj.write('\n')
+
+def load(path):
+    """
+    Reads the manifest in the file with the given path.
+    """
+    with open(path) as fileobj:
+        return json.load(fileobj)
@@ -0,0 +1,154 @@
+import pickle
+import multiprocessing
+import pyfactory
+from counters import LocalCounter, SharedMemoryCounter
+
+# =========================================================================== 
+# Parallel generation
+# =========================================================================== 
+
+def _numbered():
+    """
+    Returns the attribute classes, whose values are numbered by named
+    counters (see Sequence and providers.Provider).
+    """
+    return (pyfactory.Sequence, pyfactory.providers.Provider)
+
+def _init_worker(counter, shared):
+    """
+    Lets the worker take its ids and the numbers of the values of its
+    Sequences and Providers from the counters shared by all workers.
+
+    shared -- a list of (class, counters) pairs.
+    """
+    pyfactory.UniqueIDGenerator.reset(counter)
+    for cls, counters in shared:
+        cls.counters.update(counters)
+
+def _generate_chunk(task):
+    """
+    Generates a single chunk of objects in a worker process.
+
+    task -- a tuple (factory_name, method, count, overrides, positions)
+    returns -- a list with the generated objects.
+    """
+    factory_name, method, count, overrides, positions = task
+    for cls, name, index in positions:
+        cls.counters[name] = LocalCounter(index)
+    batch = getattr(pyfactory.Factory, method + '_batch')
+    try:
+        return batch(factory_name, count, **overrides)
+    except Exception, e:
+        # The pool hangs if it can't unpickle the exception of a worker
+        try:
+            pickle.loads(pickle.dumps(e, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            raise pyfactory.FactoryException(
+                "%s in a worker: %s" % (e.__class__.__name__, e)
+            )
+        raise
+
+def _reserve(factory_name, n, overrides):
+    """
+    Reserves n values of each Sequence and Provider of the factory, which
+    isn't overridden and doesn't share its counter with other attributes.
+
+    returns -- a list of (class, name, index) tuples with the index of the
+    first reserved value of each attribute.
+    """
+    element  = pyfactory.Factory._find_factory(factory_name)
+    reserved = []
+    for key, val in element._dynamic:
+        if key in overrides:
+            continue
+        for cls in _numbered():
+            if isinstance(val, cls) and \
+               val.name == '%s.%s' % (element.name, key):
+                index = cls._named(val.name).allocate(n)
+                reserved.append((cls, val.name, index))
+    return reserved
+
+def _tasks(factory_name, method, n, chunk_size, overrides, positions):
+    """
+    Splits the work into chunks of at most chunk_size objects. Overrides marked
+    by each() are sliced accordingly, and so are the reserved values of
+    the Sequences and Providers: each chunk starts at its own offset, so the
+    values don't depend on the chunking.
+    """
+    for start in xrange(0, n, chunk_size):
+        count = min(chunk_size, n - start)
+        chunk_overrides = {}
+        for key, val in overrides.iteritems():
+            if isinstance(val, pyfactory.each):
+                val = val[start:start + count]
+            chunk_overrides[key] = val
+        chunk_positions = [
+            (cls, name, index + start) for cls, name, index in positions
+        ]
+        yield (factory_name, method, count, chunk_overrides, chunk_positions)
+
+def _share(counters):
+    """
+    Replaces the LocalCounters in the dictionary by SharedMemoryCounters with
+    the same values.
+
+    returns -- a dictionary with the replaced counters.
+    """
+    replaced = {}
+    for name, counter in counters.items():
+        if isinstance(counter, LocalCounter):
+            replaced[name] = counter
+            counters[name] = SharedMemoryCounter(counter.allocate(0))
+    return replaced
+
+def _unshare(counters, replaced):
+    """
+    Puts the replaced counters back, advanced to the values of the shared
+    ones.
+    """
+    for name, counter in replaced.iteritems():
+        counter.reset(counters[name].value)
+        counters[name] = counter
+
+def generate(factory_name, n, workers, chunk_size, method, overrides):
+    """
+    Generates n objects in a pool of worker processes and yields them in
+    chunks (lists) of at most chunk_size objects, in order.
+
+    The workers are forked, so they know all the factories registered so far.
+    The ids of the Generator attributes are taken from a counter shared by
+    all workers and the current process, so they never collide. So are the
+    numbers of the values of Sequences and Providers (every attribute of a
+    factory is named, see bind). The Sequences and Providers of the generated
+    factory itself get a reserved range, which is sliced per chunk like the
+    overrides, so they generate the same values as a single batch.
+
+    method -- 'build', 'create' or 'attributes_for'
+    """
+    generator = pyfactory.UniqueIDGenerator
+    counter   = generator.counter
+    shared    = counter
+    if isinstance(counter, LocalCounter):
+        shared = SharedMemoryCounter(counter.allocate(0))
+
+    positions = _reserve(factory_name, n, overrides)
+    replaced  = [(cls, _share(cls.counters)) for cls in _numbered()]
+    try:
+        pool = multiprocessing.Pool(workers, _init_worker, (
+            shared, [(cls, dict(cls.counters)) for cls in _numbered()]
+        ))
+        try:
+            tasks = _tasks(
+                factory_name, method, n, chunk_size, overrides, positions
+            )
+            for chunk in pool.imap(_generate_chunk, tasks):
+                yield chunk
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        for cls, counters in replaced:
+            _unshare(cls.counters, counters)
+        if shared is not counter:
+            counter.allocate(max(0, shared.value - counter.allocate(0)))
@@ -0,0 +1,190 @@
+from factory import FactoryException
+
+# =========================================================================== 
+# Persistence backends
+# =========================================================================== 
+
+class Backend(object):
+    """
+    A backend is responsible for saving the objects created by the factories.
+    Derive your own backends from this class and override save. If the
+    datastore is able to save many objects at once, override save_batch, too.
+    Factory.cleanup() needs delete and, for objects, which were garbage
+    collected in the meantime, key and delete_keys.
+
+    chunk_size -- the maximum number of objects, which are passed to a single
+    save_batch call.
+    """
+    def __init__(self, chunk_size=500):
+        self.chunk_size = chunk_size
+
+    def save(self, obj):
+        """
+        Saves a single object.
+        """
+        raise NotImplementedError
+
+    def save_batch(self, objs):
+        """
+        Saves a list of objects of the same class. The default implementation
+        simply saves every object on its own.
+        """
+        for obj in objs:
+            self.save(obj)
+
+    def returns_keys(self, klass):
+        """
+        Returns whether save_batch sets the keys of the saved objects of
+        klass (e.g. auto-generated ids). If not, a session saves the objects,
+        which other objects refer to, one by one (see Session.flush).
+        """
+        return True
+
+    def key(self, obj):
+        """
+        Returns the key of a saved object, which identifies it for
+        delete_keys, or None if the object can only be deleted through
+        delete. The key must not reference the object.
+        """
+        return None
+
+    def delete(self, obj):
+        """
+        Deletes a single object.
+        """
+        raise NotImplementedError
+
+    def delete_batch(self, objs):
+        """
+        Deletes a list of objects of the same class. The default
+        implementation simply deletes every object on its own.
+        """
+        for obj in objs:
+            self.delete(obj)
+
+    def delete_keys(self, klass, keys):
+        """
+        Deletes the objects of klass with the given keys (see key).
+        """
+        raise NotImplementedError
+
+class MethodBackend(Backend):
+    """
+    Saves objects by calling the method with the given name on them, e.g.
+    'save' or 'put'. They are deleted by calling the method delete_method.
+    """
+    def __init__(self, method, chunk_size=500, delete_method='delete'):
+        Backend.__init__(self, chunk_size)
+        self.method        = method
+        self.delete_method = delete_method
+
+    def save(self, obj):
+        getattr(obj, self.method)()
+
+    def delete(self, obj):
+        getattr(obj, self.delete_method)()
+
+class DjangoBackend(MethodBackend):
+    """
+    Saves objects through the Django ORM. Batches are saved with a single
+    bulk_create call, which neither calls save() nor sends signals. They are
+    deleted by their primary keys with a single query.
+
+    Django copies the primary key of a related object into the foreign key
+    column when the object is assigned, so related objects saved afterwards
+    (e.g. within a session) leave the column empty. The foreign keys are
+    therefore copied again from the related objects before saving.
+    """
+    def __init__(self, chunk_size=500):
+        MethodBackend.__init__(self, 'save', chunk_size)
+
+    def _refresh_foreign_keys(self, objs):
+        """
+        Copies the primary keys of the cached related objects into the empty
+        foreign key columns of the given objects of the same class.
+        """
+        meta = getattr(objs[0].__class__, '_meta', None)
+        for field in getattr(meta, 'concrete_fields', ()):
+            if not (getattr(field, 'remote_field', None) or
+                    getattr(field, 'rel', None)):
+                continue
+            for obj in objs:
+                if getattr(obj, field.attname) is not None:
+                    continue
+                if hasattr(field, 'get_cached_value'):
+                    related = field.get_cached_value(obj, None)
+                else:
+                    related = getattr(obj, field.get_cache_name(), None)
+                if related is not None:
+                    setattr(obj, field.attname, related.pk)
+
+    def save(self, obj):
+        self._refresh_foreign_keys([obj])
+        obj.save()
+
+    def save_batch(self, objs):
+        if objs:
+            self._refresh_foreign_keys(objs)
+            objs[0].__class__._default_manager.bulk_create(objs)
+
+    def returns_keys(self, klass):
+        from django.db import connections, router
+        features = connections[router.db_for_write(klass)].features
+        return bool(
+            getattr(features, 'can_return_rows_from_bulk_insert', False) or
+            getattr(features, 'can_return_ids_from_bulk_insert', False)
+        )
+
+    def key(self, obj):
+        return getattr(obj, 'pk', None)
+
+    def delete_batch(self, objs):
+        if not objs:
+            return
+        keys = [obj.pk for obj in objs]
+        if None in keys:
+            raise FactoryException(
+                "Can't delete %s objects without a primary key! bulk_create "
+                "sets them on PostgreSQL only." % objs[0].__class__.__name__
+            )
+        self.delete_keys(objs[0].__class__, keys)
+
+    def delete_keys(self, klass, keys):
+        klass._default_manager.filter(pk__in=keys).delete()
+
+class AppEngineBackend(MethodBackend):
+    """
+    Saves objects to the Google App Engine datastore. Batches are saved with
+    a single put_multi (ndb) or put (db) call.
+    """
+    def __init__(self, chunk_size=500):
+        MethodBackend.__init__(self, 'put', chunk_size)
+
+    def save_batch(self, objs):
+        if not objs:
+            return
+        from google.appengine.ext import db, ndb
+        if isinstance(objs[0], ndb.Model):
+            ndb.put_multi(objs)
+        else:
+            db.put(objs)
+
+    def key(self, obj):
+        key = getattr(obj, 'key', None)
+        return key() if callable(key) else key
+
+    def delete(self, obj):
+        self.delete_keys(obj.__class__, [self.key(obj)])
+
+    def delete_batch(self, objs):
+        if objs:
+            self.delete_keys(objs[0].__class__, map(self.key, objs))
+
+    def delete_keys(self, klass, keys):
+        if not keys:
+            return
+        from google.appengine.ext import db, ndb
+        if isinstance(keys[0], ndb.Key):
+            ndb.delete_multi(keys)
+        else:
+            db.delete(keys)
@@ -0,0 +1,225 @@
+import time
+import threading
+import contextlib
+import pyfactory
+from factory import FactoryBuilder, FactoryElement, FactoryAttribute
+
+# =========================================================================== 
+# Profiling
+# =========================================================================== 
+# The profiler is opt-in: enable() replaces the methods listed below with
+# timed versions and disable() restores the originals, so there is no
+# overhead at all while profiling is disabled.
+
+_element_phases = {
+    '_fetch_class':         'fetch_class',
+    '_attributes_batch':    'attributes',
+    'attributes_for':       'attributes',
+    'build':                'build',
+    'build_batch':          'build_batch',
+    'attributes_for_batch': 'attributes_for_batch',
+    'columns':              'columns',
+    'create':               'create',
+    'create_batch':         'create_batch',
+    'create_concurrent':    'create_concurrent'
+}
+
+active    = None # the enabled Profiler
+last      = None # the last enabled Profiler
+_original = {}
+
+class Profiler(object):
+    """
+    Records the number of calls, the cumulative time and the self time (the
+    cumulative time without the time spent in nested phases) per factory and
+    phase. Time spent in nested factories (Foreign attributes) is recorded
+    for the nested factory and excluded from the self time of the outer one.
+    """
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_factory(self):
+        """
+        Returns the name of the innermost factory, which is being processed
+        in the current thread, or None.
+        """
+        stack = self._stack()
+        return stack[-1][0] if stack else None
+
+    def start(self, factory, phase):
+        self._stack().append([factory, phase, time.time(), 0.0])
+
+    def discard(self):
+        """
+        Ends the innermost phase without recording it. Its time remains part
+        of the self time of the enclosing phase.
+        """
+        self._stack().pop()
+
+    def stop(self):
+        stack = self._stack()
+        factory, phase, started, children = stack.pop()
+        elapsed = time.time() - started
+        if stack:
+            stack[-1][3] += elapsed
+        with self._lock:
+            entry = self._stats.setdefault((factory, phase), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += elapsed - children
+
+    def stats(self):
+        """
+        returns -- a dictionary {factory: {phase: {'calls': ...,
+        'cumtime': ..., 'selftime': ...}}}
+        """
+        result = {}
+        with self._lock:
+            for (factory, phase), (calls, cum, own) in self._stats.items():
+                result.setdefault(factory, {})[phase] = {
+                    'calls':    calls,
+                    'cumtime':  cum,
+                    'selftime': own
+                }
+        return result
+
+class _TimedBackend(object):
+    """
+    Wraps a persistence backend and records its saves as phase 'save'.
+    """
+    def __init__(self, backend, profiler):
+        self._backend  = backend
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+    def _timed(self, method, arg):
+        profiler = self._profiler
+        profiler.start(profiler.current_factory(), 'save')
+        try:
+            return method(arg)
+        finally:
+            profiler.stop()
+
+    def save(self, obj):
+        return self._timed(self._backend.save, obj)
+
+    def save_batch(self, objs):
+        return self._timed(self._backend.save_batch, objs)
+
+def _timed(method, phase, factory):
+    def timed(self, *args, **kwargs):
+        profiler = active
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        profiler.start(factory(self, args), phase)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profiler.stop()
+    timed.__name__ = method.__name__
+    timed.__doc__  = method.__doc__
+    return timed
+
+def _timed_generate(method):
+    def timed(self, *args):
+        profiler = active
+        items    = method(self, *args)
+        while True:
+            profiler.start(self.name, 'attributes')
+            try:
+                item = next(items)
+            except StopIteration:
+                # the end of the iterator isn't a call
+                profiler.discard()
+                return
+            except:
+                profiler.stop()
+                raise
+            profiler.stop()
+            yield item
+    return timed
+
+def _attribute_classes(cls=FactoryAttribute):
+    yield cls
+    for sub in cls.__subclasses__():
+        for klass in _attribute_classes(sub):
+            yield klass
+
+def _patch(owner, name, replacement):
+    _original[(owner, name)] = owner.__dict__[name]
+    setattr(owner, name, replacement)
+
+def enable(profiler=None):
+    """
+    Enables profiling with the given (or a new) Profiler.
+
+    returns -- the enabled Profiler.
+    """
+    global active, last
+    if active is not None:
+        disable()
+    active = last = profiler or Profiler()
+
+    by_name    = lambda self, args: args[0]
+    by_element = lambda self, args: self.name
+    by_scope   = lambda self, args: active.current_factory()
+
+    _patch(FactoryBuilder, '_find_factory', _timed(
+        FactoryBuilder.__dict__['_find_factory'], 'lookup', by_name
+    ))
+    for name, phase in _element_phases.items():
+        method = FactoryElement.__dict__[name]
+        _patch(FactoryElement, name, _timed(method, phase, by_element))
+    _patch(FactoryElement, '_generate', _timed_generate(
+        FactoryElement.__dict__['_generate']
+    ))
+    for cls in _attribute_classes():
+        for name in ('__call__', 'batch'):
+            if name in cls.__dict__:
+                _patch(cls, name, _timed(
+                    cls.__dict__[name], cls.__name__.lower(), by_scope
+                ))
+
+    backend = pyfactory.backend
+    _original[(pyfactory, 'backend')] = backend
+    pyfactory.backend = lambda: _TimedBackend(backend(), active)
+    return active
+
+def disable():
+    """
+    Disables profiling and restores the original methods.
+    """
+    global active
+    for (owner, name), original in _original.items():
+        setattr(owner, name, original)
+    _original.clear()
+    active = None
+
+@contextlib.contextmanager
+def profile():
+    """
+    Enables profiling for the with-block and yields the Profiler.
+    """
+    profiler = enable()
+    try:
+        yield profiler
+    finally:
+        disable()
+
+def stats():
+    """
+    Returns the statistics of the active (or the last) Profiler.
+    """
+    if last is None:
+        return {}
+    return last.stats()
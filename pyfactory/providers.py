@@ -0,0 +1,270 @@
+import copy
+import bisect
+import random
+import hashlib
+import datetime
+import threading
+from factory import FactoryAttribute, FactoryException
+from counters import LocalCounter
+
+# =========================================================================== 
+# Providers
+# =========================================================================== 
+
+FIRST_NAMES = [
+    'Alice', 'Ben', 'Clara', 'David', 'Emma', 'Felix', 'Grace', 'Henry',
+    'Ida', 'Jonas', 'Karen', 'Leo', 'Mia', 'Noah', 'Olivia', 'Paul',
+    'Quinn', 'Rosa', 'Sam', 'Tina', 'Uma', 'Victor', 'Wendy', 'Yusuf'
+]
+
+LAST_NAMES = [
+    'Adams', 'Baker', 'Clark', 'Davis', 'Evans', 'Fischer', 'Garcia',
+    'Hill', 'Ito', 'Jones', 'King', 'Lopez', 'Miller', 'Nguyen', 'Owens',
+    'Parker', 'Quist', 'Rossi', 'Smith', 'Taylor', 'Wagner', 'Young'
+]
+
+WORDS = [
+    'alpha', 'blue', 'cloud', 'delta', 'echo', 'forest', 'green', 'harbor',
+    'island', 'jade', 'kite', 'lemon', 'maple', 'north', 'ocean', 'pine',
+    'quartz', 'river', 'stone', 'tiger', 'union', 'valley', 'willow', 'zen'
+]
+
+class Provider(FactoryAttribute):
+    """
+    Base class of the attributes, which generate random fake data. Every
+    attribute of every factory draws from its own random stream, which is
+    seeded from the global seed and the name of the stream. A stream yields
+    the same values whether they are drawn one by one or in batches, so the
+    same seed always produces the same dataset.
+
+    The values of a stream are numbered by a counter like the values of a
+    Sequence. The stream is split into blocks of BLOCK_SIZE values, which are
+    seeded separately, so the stream can be positioned at any value without
+    drawing all values before it (see parallel.generate).
+
+    Derived classes implement _values, which returns n values drawn from the
+    given random.Random object. It must draw the same number of random
+    numbers for every value.
+
+    name -- the name of the stream. By default it is '<factory>.<attribute>';
+    attributes with the same name share their stream.
+    """
+    BLOCK_SIZE = 1024
+
+    seed     = 0
+    counters = {}
+    streams  = {}
+    _lock    = threading.Lock()
+
+    def __init__(self, name=None):
+        self.name = name
+        self._named(self._stream_name())
+
+    @classmethod
+    def _named(cls, name):
+        """
+        Returns the counter of the stream with the given name.
+        """
+        with cls._lock:
+            counter = cls.counters.get(name)
+            if counter is None:
+                counter = cls.counters[name] = LocalCounter()
+        return counter
+
+    @classmethod
+    def reseed(cls, seed=None):
+        """
+        Restarts all streams with the given seed (or the current one).
+        """
+        with cls._lock:
+            if seed is not None:
+                cls.seed = seed
+            cls.streams.clear()
+            for counter in cls.counters.values():
+                counter.reset()
+
+    def _stream_name(self):
+        return self.name or self.__class__.__name__
+
+    def _random(self, name, block, offset):
+        """
+        Returns the random stream with the given name positioned at the given
+        offset of the block. The stream of the last call is continued if
+        possible. The caller must hold the lock.
+        """
+        cached = self.streams.get(name)
+        if cached is not None and cached[0] == block and cached[1] <= offset:
+            stream = cached[2]
+            skip   = offset - cached[1]
+        else:
+            digest = hashlib.md5('%r:%s:%d' % (self.seed, name, block))
+            stream = random.Random(int(digest.hexdigest(), 16))
+            skip   = offset
+        if skip:
+            self._values(stream, skip)
+        return stream
+
+    def _draw(self, n):
+        """
+        Returns the next n values of the stream.
+        """
+        name     = self._stream_name()
+        counter  = self.counters.get(name) or self._named(name)
+        position = counter.allocate(n)
+        values   = []
+        with self._lock:
+            while n:
+                block, offset = divmod(position, self.BLOCK_SIZE)
+                count  = min(n, self.BLOCK_SIZE - offset)
+                stream = self._random(name, block, offset)
+                values.extend(self._values(stream, count))
+                self.streams[name] = (block, offset + count, stream)
+                position += count
+                n        -= count
+        return values
+
+    def bind(self, factory_name, key):
+        if self.name is not None:
+            return self
+        bound = copy.copy(self)
+        bound.name = '%s.%s' % (factory_name, key)
+        self._named(bound.name)
+        return bound
+
+    def _values(self, stream, n):
+        raise NotImplementedError()
+
+    def __call__(self, type):
+        return self._draw(1)[0]
+
+    def batch(self, type, n):
+        return self._draw(n)
+
+class Integer(Provider):
+    """
+    Generates integers between low and high (both included).
+    """
+    def __init__(self, low, high, name=None):
+        if high < low:
+            raise FactoryException("The range %d..%d is empty!" % (low, high))
+        Provider.__init__(self, name)
+        self.low  = low
+        self.high = high
+
+    def _values(self, stream, n):
+        low  = self.low
+        span = self.high - low + 1
+        draw = stream.random
+        return [low + int(draw() * span) for i in xrange(n)]
+
+class Choice(Provider):
+    """
+    Chooses from the given choices. If weights are given, every choice is
+    chosen with the probability of its weight relative to the sum of all
+    weights.
+    """
+    def __init__(self, choices, weights=None, name=None):
+        choices = list(choices)
+        if not choices:
+            raise FactoryException("There are no choices!")
+        if weights is None:
+            weights = [1] * len(choices)
+        if len(weights) != len(choices):
+            raise FactoryException("There must be a weight for each choice!")
+        Provider.__init__(self, name)
+        self.choices    = choices
+        self.cumulative = []
+        total = 0
+        for weight in weights:
+            total += weight
+            self.cumulative.append(total)
+
+    def _values(self, stream, n):
+        choices    = self.choices
+        cumulative = self.cumulative
+        total      = cumulative[-1]
+        draw       = stream.random
+        return [
+            choices[bisect.bisect_right(cumulative, draw() * total)]
+            for i in xrange(n)
+        ]
+
+class Name(Provider):
+    """
+    Generates person names.
+
+    part -- 'full' (default), 'first' or 'last'.
+    """
+    def __init__(self, part='full', name=None):
+        if part not in ('full', 'first', 'last'):
+            raise FactoryException("Unknown part of a name: %r" % part)
+        Provider.__init__(self, name)
+        self.part = part
+
+    def _values(self, stream, n):
+        draw  = stream.random
+        first = len(FIRST_NAMES)
+        last  = len(LAST_NAMES)
+        if self.part == 'first':
+            return [FIRST_NAMES[int(draw() * first)] for i in xrange(n)]
+        if self.part == 'last':
+            return [LAST_NAMES[int(draw() * last)] for i in xrange(n)]
+        return [
+            '%s %s' % (FIRST_NAMES[int(draw() * first)],
+                       LAST_NAMES[int(draw() * last)])
+            for i in xrange(n)
+        ]
+
+class Email(Provider):
+    """
+    Generates email addresses like 'ben.miller42@example.com'.
+    """
+    def __init__(self, domain='example.com', name=None):
+        Provider.__init__(self, name)
+        self.domain = domain
+
+    def _values(self, stream, n):
+        draw  = stream.random
+        first = len(FIRST_NAMES)
+        last  = len(LAST_NAMES)
+        return [
+            '%s.%s%d@%s' % (FIRST_NAMES[int(draw() * first)].lower(),
+                            LAST_NAMES[int(draw() * last)].lower(),
+                            int(draw() * 1000), self.domain)
+            for i in xrange(n)
+        ]
+
+class URL(Provider):
+    """
+    Generates URLs like 'https://www.blue-river.com/maple'.
+    """
+    def _values(self, stream, n):
+        draw  = stream.random
+        words = len(WORDS)
+        return [
+            'https://www.%s-%s.com/%s' % (WORDS[int(draw() * words)],
+                                          WORDS[int(draw() * words)],
+                                          WORDS[int(draw() * words)])
+            for i in xrange(n)
+        ]
+
+class Date(Provider):
+    """
+    Generates dates between start and end (both included).
+    """
+    def __init__(self, start=datetime.date(2000, 1, 1),
+                 end=datetime.date(2020, 12, 31), name=None):
+        if end < start:
+            raise FactoryException("The range %s..%s is empty!" % (start, end))
+        Provider.__init__(self, name)
+        self.start = start
+        self.end   = end
+
+    def _values(self, stream, n):
+        start = self.start.toordinal()
+        span  = self.end.toordinal() - start + 1
+        draw  = stream.random
+        return [
+            datetime.date.fromordinal(start + int(draw() * span))
+            for i in xrange(n)
+        ]
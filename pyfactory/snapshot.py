@@ -0,0 +1,200 @@
+import os
+import re
+import glob
+import mmap
+import hashlib
+import tempfile
+import types
+import cPickle as pickle
+import pyfactory
+from factory import FactoryAttribute, FactoryException, Foreign
+
+# =========================================================================== 
+# Fingerprints
+# =========================================================================== 
+
+def _fingerprint(value, builder, seen):
+    """
+    Returns a string, which changes whenever the given attribute value
+    changes. Functions are identified by their code, the values they close
+    over and the globals they use, Foreign attributes by the definition of
+    the referenced factory. Values, whose repr contains a memory address,
+    can't be fingerprinted and raise a FactoryException.
+
+    seen -- the names of the factories and the functions, which are already
+    fingerprinted.
+    """
+    if isinstance(value, Foreign):
+        return 'Foreign(%r, %r, %s, %s)' % (
+            value.factory_name,
+            value.pool,
+            _fingerprint(value.objects, builder, seen),
+            definition_hash(builder, value.factory_name, seen)
+        )
+    if isinstance(value, FactoryAttribute):
+        return '%s(%s)' % (value.__class__.__name__, ', '.join(
+            '%s=%s' % (k, _fingerprint(v, builder, seen))
+            for k, v in sorted(vars(value).items())
+        ))
+    if isinstance(value, (list, tuple)):
+        return '%s(%s)' % (value.__class__.__name__, ', '.join(
+            _fingerprint(v, builder, seen) for v in value
+        ))
+    value = getattr(value, 'im_func', value)
+    code  = getattr(value, 'func_code', None)
+    if code is not None:
+        return _function_fingerprint(value, builder, seen)
+    fingerprint = repr(value)
+    if _ADDRESS.search(fingerprint):
+        raise FactoryException(
+            "Can't fingerprint %s, define a __repr__ without the address!"
+            % fingerprint
+        )
+    return fingerprint
+
+_ADDRESS = re.compile(r' at 0x[0-9a-fA-F]+')
+
+def _code_fingerprint(code):
+    """
+    Returns a string identifying the given code object including the code
+    objects nested in it (e.g. lambdas and generator expressions).
+    """
+    return 'code(%r, %r, %s)' % (code.co_code, code.co_names, ', '.join(
+        _code_fingerprint(c) if isinstance(c, types.CodeType) else repr(c)
+        for c in code.co_consts
+    ))
+
+def _global_names(code):
+    """
+    Returns the names used by the given code object and the code objects
+    nested in it.
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+def _function_fingerprint(function, builder, seen):
+    """
+    Returns a string identifying the given function by its code, defaults,
+    the contents of its closure and the globals it uses. Global objects,
+    which can't be fingerprinted (see _fingerprint), are identified by their
+    class only.
+    """
+    if function in seen:
+        return 'recursive(%s)' % function.__name__
+    seen    = set(seen) | set([function])
+    cells   = [c.cell_contents for c in function.func_closure or ()]
+    globals = []
+    for name in sorted(_global_names(function.func_code)):
+        if name not in function.func_globals:
+            continue
+        try:
+            value = _fingerprint(function.func_globals[name], builder, seen)
+        except FactoryException:
+            value = 'instance(%s)' % type(function.func_globals[name]).__name__
+        globals.append('%s=%s' % (name, value))
+    return 'function(%s, %s, %s, %s)' % (
+        _code_fingerprint(function.func_code),
+        _fingerprint(function.func_defaults, builder, seen),
+        _fingerprint(cells, builder, seen),
+        ', '.join(globals)
+    )
+
+def definition_hash(builder, factory_name, seen=()):
+    """
+    Returns a hash of the definition (the model-class and the attributes) of
+    the factory with the given name.
+    """
+    if factory_name in seen:
+        return 'recursive(%r)' % factory_name
+    seen    = set(seen) | set([factory_name])
+    element = builder._find_factory(factory_name)
+    klass   = element.klass
+    if klass is not None and not isinstance(klass, basestring):
+        klass = '%s.%s' % (klass.__module__, klass.__name__)
+    if element.record:
+        klass = 'record(%s)' % klass
+    definition = '%s:%s' % (klass, ', '.join(
+        '%s=%s' % (k, _fingerprint(v, builder, seen))
+        for k, v in sorted(element.attributes.items())
+    ))
+    return hashlib.sha1(definition).hexdigest()
+
+# =========================================================================== 
+# Snapshot cache
+# =========================================================================== 
+
+class SnapshotCache(object):
+    """
+    Stores the results of the factories on disk and reloads them on later
+    runs instead of building them again. A snapshot is keyed by the factory
+    name, the method, the overrides and the hash of the factory definition
+    (including the definitions of all factories referenced through Foreign
+    attributes), so it is rebuilt automatically if the definition changes.
+
+    The results are stored with pickle, so they must be picklable. Every call
+    returns a fresh copy.
+
+    directory -- the directory where the snapshots are stored.
+    builder -- the FactoryBuilder to use, defaults to pyfactory.Factory.
+    """
+    def __init__(self, directory, builder=None):
+        self.directory = directory
+        self.builder   = builder or pyfactory.Factory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def build(self, factory_name, **kwargs):
+        return self._get('build', factory_name, None, kwargs)
+
+    def build_batch(self, factory_name, n, **kwargs):
+        return self._get('build_batch', factory_name, n, kwargs)
+
+    def attributes_for(self, factory_name, **kwargs):
+        return self._get('attributes_for', factory_name, None, kwargs)
+
+    def attributes_for_batch(self, factory_name, n, **kwargs):
+        return self._get('attributes_for_batch', factory_name, n, kwargs)
+
+    def _path(self, method, factory_name, n, overrides):
+        """
+        Returns a tuple (path, pattern) with the path of the snapshot and a
+        glob-pattern matching all snapshots of older definitions.
+        """
+        request = '%s:%r:%s' % (method, n, ', '.join(
+            '%s=%s' % (k, _fingerprint(v, self.builder, ()))
+            for k, v in sorted(overrides.items())
+        ))
+        prefix = os.path.join(self.directory, '%s-%s-' % (
+            factory_name, hashlib.sha1(request).hexdigest()[:16]
+        ))
+        definition = definition_hash(self.builder, factory_name)
+        return prefix + definition + '.snapshot', prefix + '*.snapshot'
+
+    def _get(self, method, factory_name, n, overrides):
+        path, pattern = self._path(method, factory_name, n, overrides)
+        if os.path.exists(path):
+            return self._load(path)
+
+        args  = (n,) if n is not None else ()
+        value = getattr(self.builder, method)(factory_name, *args, **overrides)
+        for outdated in glob.glob(pattern):
+            os.remove(outdated)
+        self._store(path, value)
+        return value
+
+    def _load(self, path):
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return pickle.load(mapped)
+            finally:
+                mapped.close()
+
+    def _store(self, path, value):
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, path)
@@ -0,0 +1,57 @@
+import unittest
+import pyfactory
+from pyfactory.columns import ConstantColumn, numpy
+
+class ConstantColumnTest(unittest.TestCase):
+    def setUp(self):
+        self.column = ConstantColumn('value', 3)
+
+    def test_should_repeat_the_value(self):
+        self.assertEqual(list(self.column), ['value'] * 3)
+        self.assertEqual(self.column[-1], 'value')
+
+    def test_should_have_the_given_length(self):
+        self.assertEqual(len(self.column), 3)
+        self.assertEqual(len(self.column[1:]), 2)
+
+    def test_should_raise_for_indices_out_of_range(self):
+        self.assertRaises(IndexError, lambda: self.column[3])
+
+class FactoryColumnsTest(unittest.TestCase):
+    def setUp(self):
+        self.columns = pyfactory.Factory.columns(
+            'test_object_generator', 4,
+            last_name=pyfactory.each(['a', 'b', 'c', 'd'])
+        )
+
+    def test_should_return_one_column_per_attribute(self):
+        self.assertEqual(sorted(self.columns), ['first_name', 'last_name'])
+
+    def test_should_generate_the_generator_column_from_an_id_range(self):
+        names = self.columns['first_name']
+        ids = [int(name.split()[-1]) for name in names]
+        self.assertEqual(ids, range(ids[0], ids[0] + 4))
+
+    def test_should_use_sequence_overrides_as_column(self):
+        self.assertEqual(list(self.columns['last_name']), ['a', 'b', 'c', 'd'])
+
+    def test_should_broadcast_static_attributes(self):
+        columns = pyfactory.Factory.columns('test_object', 1000)
+        self.assert_(isinstance(columns['first_name'], ConstantColumn))
+        self.assertEqual(len(columns['first_name']), 1000)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_should_return_numpy_arrays(self):
+        columns = pyfactory.Factory.columns('test_object', 3, numpy=True)
+        self.assertEqual(columns['first_name'].shape, (3,))
+
+    @unittest.skipIf(numpy is not None, 'NumPy is installed')
+    def test_should_raise_without_numpy(self):
+        self.assertRaises(
+            pyfactory.FactoryException,
+            pyfactory.Factory.columns,
+            'test_object', 3, numpy=True
+        )
+
+if __name__ == '__main__':
+    unittest.main()
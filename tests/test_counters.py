@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import multiprocessing
+import pyfactory
+
+def collect_ids(queue, count):
+    queue.put([pyfactory.UniqueIDGenerator.generate() for i in range(count)])
+
+def allocate_blocks(queue, counter):
+    queue.put([counter.allocate(10) for i in range(50)])
+
+def collect_from_processes(target, args, processes=4):
+    queue = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=target, args=(queue,) + args)
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    results = [queue.get() for worker in workers]
+    for worker in workers:
+        worker.join()
+    return sum(results, [])
+
+class UniqueIDGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        self.counter = pyfactory.UniqueIDGenerator.counter
+
+    def tearDown(self):
+        pyfactory.UniqueIDGenerator.reset(self.counter)
+
+    def test_should_generate_unique_ids_across_threads(self):
+        results = []
+        def generate():
+            results.append([
+                pyfactory.UniqueIDGenerator.generate() for i in range(1000)
+            ])
+        threads = [threading.Thread(target=generate) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ids = sum(results, [])
+        self.assertEqual(len(set(ids)), 8000)
+
+    def test_should_only_take_one_block_per_block_size_ids(self):
+        counter = pyfactory.LocalCounter()
+        pyfactory.UniqueIDGenerator.reset(counter)
+        ids = [pyfactory.UniqueIDGenerator.generate() for i in range(150)]
+        self.assertEqual(ids, range(1, 151))
+        self.assertEqual(counter.value, 200)
+
+    def test_should_generate_unique_ids_across_processes(self):
+        pyfactory.UniqueIDGenerator.reset(pyfactory.SharedMemoryCounter())
+        pyfactory.UniqueIDGenerator.generate()
+        ids = collect_from_processes(collect_ids, (250,))
+        ids.append(pyfactory.UniqueIDGenerator.generate())
+        self.assertEqual(len(set(ids)), 1001)
+
+class FileCounterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.counter = pyfactory.FileCounter(
+            os.path.join(self.directory, 'ids')
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_should_start_at_zero(self):
+        self.assertEqual(self.counter.allocate(10), 0)
+        self.assertEqual(self.counter.allocate(10), 10)
+        self.assertEqual(self.counter.value, 20)
+
+    def test_should_allocate_disjoint_blocks_across_processes(self):
+        starts = collect_from_processes(allocate_blocks, (self.counter,))
+        self.assertEqual(sorted(starts), range(0, 2000, 10))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+import pyfactory
+from pyfactory import cli
+from test_factory import Tester
+
+class ExportChildFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'export_child'
+        klass = Tester
+
+    class Elements:
+        id = pyfactory.Generator(lambda i: i)
+
+class ExportFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'export_object'
+        klass = Tester
+
+    class Elements:
+        name   = 'tab\there'
+        parent = pyfactory.Foreign('export_child')
+        note   = None
+
+class FactoryDumpTest(unittest.TestCase):
+    def dump(self, format, n=3, **kwargs):
+        output = StringIO()
+        pyfactory.Factory.dump(
+            'export_object', n, output, format, chunk_size=2, **kwargs
+        )
+        return output.getvalue().splitlines()
+
+    def test_should_write_csv_with_a_header(self):
+        lines = self.dump('csv')
+        self.assertEqual(lines[0], 'name,note,parent_id')
+        self.assertEqual(len(lines), 4)
+
+    def test_should_write_json_lines(self):
+        rows = map(json.loads, self.dump('jsonl'))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['name'], 'tab\there')
+        self.assertEqual(rows[0]['note'], None)
+
+    def test_should_write_the_copy_text_format(self):
+        fields = self.dump('copy')[0].split('\t')
+        self.assertEqual(fields[:2], ['tab\\there', '\\N'])
+
+    def test_should_flatten_foreign_attributes_to_ids(self):
+        rows = map(json.loads, self.dump('jsonl'))
+        ids  = [row['parent_id'] for row in rows]
+        self.assertEqual(len(set(ids)), 3)
+        self.assert_(all(isinstance(i, int) for i in ids))
+
+    def test_should_use_the_given_fk_field(self):
+        rows = map(json.loads, self.dump('jsonl', fk_field='missing'))
+        self.assertEqual([row['parent_id'] for row in rows], [None] * 3)
+
+    def test_should_write_the_ids_of_existing_objects(self):
+        parents = [Tester(id=7), Tester(id=8)]
+        for format in ('csv', 'jsonl', 'copy'):
+            lines = self.dump(
+                format, parent=pyfactory.Foreign('export_child',
+                                                 objects=parents)
+            )
+            self.assert_('7' in lines[-3] and '8' in lines[-2], lines)
+        rows = map(json.loads, self.dump('jsonl', parent=pyfactory.Foreign(
+            'export_child', objects=parents
+        )))
+        self.assertEqual([row['parent_id'] for row in rows], [7, 8, 7])
+
+    def test_should_use_overrides(self):
+        lines = self.dump('csv', n=1, name='overridden')
+        self.assertEqual(lines[1].split(',')[0], 'overridden')
+
+    def test_should_raise_for_unknown_formats(self):
+        self.assertRaises(pyfactory.FactoryException, self.dump, 'xml')
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'out.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_should_dump_a_factory(self):
+        cli.main([
+            'dump', '-m', 'tests.test_export', '-f', 'jsonl', '-o', self.path,
+            '--set', 'name=cli', 'export_object', '5'
+        ])
+        rows = map(json.loads, open(self.path).read().splitlines())
+        self.assertEqual([row['name'] for row in rows], ['cli'] * 5)
+
+if __name__ == '__main__':
+    unittest.main()
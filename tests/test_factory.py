@@ -1,7 +1,31 @@
+import os
+import imp
+import sys
+import pickle
+import shutil
+import tempfile
+import itertools
+import threading
 import unittest
 import pyfactory
 import mock
 
+DUPLICATE_FACTORIES = '''
+import pyfactory
+
+class Model(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class DuplicateFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_duplicate'
+        klass = Model
+
+    class Elements:
+        value = 1
+'''
+
 class Tester(object):
     """This class represents the model class"""
     def __init__(self, **kwargs):
@@ -37,6 +61,14 @@ class TestFactoryGenerator(pyfactory.FactoryObject):
         first_name = pyfactory.Generator(generate_first_name)
         last_name  = 'the last name'
 
+class TestFactoryClassObject(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_class'
+        klass = Tester
+
+    class Elements:
+        first_name = 'the first name'
+
 class TestForeignGenerator(pyfactory.FactoryObject):
     class Meta:
         name  = 'test_object_foreign'
@@ -46,6 +78,135 @@ class TestForeignGenerator(pyfactory.FactoryObject):
         last_name  = 'the last name'
     
 
+class TestSharedForeign(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_shared'
+        klass = 'tests.test_factory.Tester'
+    class Elements:
+        first_name = pyfactory.Foreign('test_object', shared=True)
+        last_name  = pyfactory.Foreign('test_object', pool=2)
+
+lazy_calls = []
+
+def lazy_full_name(obj):
+    lazy_calls.append('full_name')
+    return '%s %s' % (obj.first_name, obj.last_name)
+
+def lazy_greeting(obj):
+    lazy_calls.append('greeting')
+    return 'Hello %s' % obj.full_name
+
+class TestLazyFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_lazy'
+        klass = 'tests.test_factory.Tester'
+    class Elements:
+        first_name = 'first'
+        last_name  = 'last'
+        greeting   = pyfactory.LazyAttribute(lazy_greeting)
+        full_name  = pyfactory.LazyAttribute(lazy_full_name)
+
+vectorized_calls = []
+
+def format_usernames(values):
+    vectorized_calls.append(len(values))
+    return ['user%d' % v for v in values]
+
+class TestSequenceFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_sequence'
+        klass = 'tests.test_factory.Tester'
+    class Elements:
+        first_name = pyfactory.Sequence(format_usernames, vectorized=True)
+        last_name  = pyfactory.Sequence(start=10, step=5)
+
+class TestOtherSequenceFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_other_sequence'
+        klass = 'tests.test_factory.Tester'
+    class Elements:
+        first_name = pyfactory.Sequence(lambda i: 'name%d' % i)
+
+class TestAbstractFactory(pyfactory.FactoryObject):
+    class Meta:
+        klass = 'tests.test_factory.Tester'
+    class Elements:
+        first_name = 'abstract first'
+        last_name  = pyfactory.Sequence(lambda i: 'last%d' % i)
+
+class TestChildFactory(TestAbstractFactory):
+    class Meta:
+        name = 'test_object_child'
+    class Elements:
+        first_name = 'child first'
+
+class TestGrandchildFactory(TestChildFactory):
+    class Meta:
+        name = 'test_object_grandchild'
+
+class TestNestedElementsFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_nested_elements'
+        klass = 'tests.test_factory.Tester'
+    class Elements(TestFactory.Elements):
+        last_name = 'nested last'
+
+class ExpensiveTester(Tester):
+    """A model class, which counts the calls of its constructor"""
+    constructed = 0
+
+    def __init__(self, **kwargs):
+        ExpensiveTester.constructed += 1
+        self.tags = []
+        Tester.__init__(self, **kwargs)
+
+class TestPrototypeFactory(pyfactory.FactoryObject):
+    class Meta:
+        name      = 'test_object_prototype'
+        klass     = ExpensiveTester
+        prototype = True
+    class Elements:
+        first_name = pyfactory.Sequence(lambda i: 'first%d' % i)
+        last_name  = 'the last name'
+        options    = {'active': True}
+        full_name  = pyfactory.LazyAttribute(lazy_full_name)
+
+class TestRecordFactory(pyfactory.FactoryObject):
+    class Meta:
+        name   = 'test_object_record'
+        record = True
+    class Elements:
+        first_name = 'first'
+        last_name  = pyfactory.Sequence(lambda i: 'last%d' % i)
+        full_name  = pyfactory.LazyAttribute(lazy_full_name)
+
+class TestRecordChildFactory(TestRecordFactory):
+    class Meta:
+        name = 'test_object_record_child'
+
+class TestPrototypeChildFactory(TestPrototypeFactory):
+    class Meta:
+        name = 'test_object_prototype_child'
+
+class KeywordTester(object):
+    """A model class, which assigns all its fields in the constructor"""
+    def __init__(self, name=None, email=None):
+        self.name  = name
+        self.email = email
+        self.note  = None
+
+def lazy_email(obj):
+    return '%s@example.com' % obj.name
+
+class TestKeywordLazyFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_keyword_lazy'
+        klass = KeywordTester
+    class Elements:
+        name  = 'alice'
+        email = pyfactory.LazyAttribute(lazy_email)
+        note  = pyfactory.LazyAttribute(lambda obj: 'note for ' + obj.email)
+
 class FactoryBuildTest(unittest.TestCase):
     def setUp(self):
         self.object = pyfactory.Factory.build('test_object')
@@ -137,11 +298,514 @@ class FactoryOverridingAttributesTest(unittest.TestCase):
         )
         self.assertEqual(self.object['first_name'], 'overridden')
 
+class FactoryRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.builder = pyfactory.FactoryBuilder()
+        self.first   = pyfactory.factory.FactoryElement('a', 'x.A', {})
+        self.second  = pyfactory.factory.FactoryElement('a', 'x.B', {})
+        self.builder._add_factory(self.first)
+
+    def test_should_find_the_registered_factory(self):
+        self.assertTrue(self.builder._find_factory('a') is self.first)
+
+    def test_should_raise_for_unknown_factories(self):
+        self.assertRaises(
+            pyfactory.FactoryException,
+            self.builder._find_factory,
+            'unknown'
+        )
+
+    def test_should_raise_on_duplicate_names(self):
+        self.assertRaises(
+            pyfactory.FactoryException,
+            self.builder._add_factory,
+            self.second
+        )
+
+    def test_should_ignore_the_same_definition_imported_twice(self):
+        directory = tempfile.mkdtemp()
+        path      = os.path.join(directory, 'duplicate_factories.py')
+        with open(path, 'w') as f:
+            f.write(DUPLICATE_FACTORIES)
+        try:
+            first = imp.load_source('duplicate_a', path)
+            imp.load_source('duplicate_b', path)
+            element = pyfactory.Factory._find_factory('test_object_duplicate')
+            self.assertEqual(element.source[1], 'DuplicateFactory')
+            self.assertEqual(
+                pyfactory.Factory.build('test_object_duplicate').value, 1
+            )
+            self.assertEqual(
+                pyfactory.Factory._find_factory('test_object_duplicate').klass,
+                first.Model
+            )
+        finally:
+            pyfactory.Factory._elements.pop('test_object_duplicate', None)
+            sys.modules.pop('duplicate_a', None)
+            sys.modules.pop('duplicate_b', None)
+            shutil.rmtree(directory)
+
+    def test_should_keep_the_first_factory_if_requested(self):
+        self.builder.duplicates = 'first'
+        self.builder._add_factory(self.second)
+        self.assertTrue(self.builder._find_factory('a') is self.first)
+
+    def test_should_replace_the_factory_if_requested(self):
+        self.builder.duplicates = 'last'
+        self.builder._add_factory(self.second)
+        self.assertTrue(self.builder._find_factory('a') is self.second)
+
+class FactoryClassCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.element = pyfactory.Factory._find_factory('test_object')
+        self.element.invalidate_class()
+
+    def test_should_import_the_module_only_once(self):
+        self.element._import_module = mock.Mock(wraps=self.element._import_module)
+        pyfactory.Factory.build('test_object')
+        pyfactory.Factory.build('test_object')
+        self.assertEqual(self.element._import_module.call_count, 1)
+        del self.element._import_module
+
+    def test_should_look_up_the_class_again_after_invalidation(self):
+        pyfactory.Factory.build('test_object')
+        pyfactory.Factory.invalidate_classes()
+        self.assertEqual(self.element._resolved, None)
+
+    def test_should_accept_a_class_object_as_klass(self):
+        obj = pyfactory.Factory.build('test_object_class')
+        self.assert_(isinstance(obj, Tester))
+        self.assertEqual(obj.first_name, 'the first name')
+
+class FactoryBuildPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.element = pyfactory.factory.FactoryElement(
+            'wide',
+            Tester,
+            dict([('field%d' % i, i) for i in range(50)] + [
+                ('first_name', pyfactory.Generator(generate_first_name))
+            ])
+        )
+
+    def test_should_only_keep_special_attributes_as_dynamic(self):
+        self.assertEqual(len(self.element._static), 50)
+        self.assertEqual([k for k, v in self.element._dynamic], ['first_name'])
+
+    def test_should_return_all_attributes(self):
+        attrs = self.element.attributes_for()
+        self.assertEqual(len(attrs), 51)
+        self.assertEqual(attrs['field42'], 42)
+
+    def test_should_not_modify_the_static_values(self):
+        self.element.attributes_for(field1='overridden')
+        self.assertEqual(self.element._static['field1'], 1)
+
+    def test_should_evaluate_special_attributes_given_as_override(self):
+        attrs = self.element.attributes_for(
+            field1=pyfactory.Generator(lambda i: 'generated')
+        )
+        self.assertEqual(attrs['field1'], 'generated')
+
+class FactoryBatchTest(unittest.TestCase):
+    def test_should_build_the_given_number_of_objects(self):
+        objs = pyfactory.Factory.build_batch('test_object', 3)
+        self.assertEqual(len(objs), 3)
+        self.assert_(all(isinstance(o, Tester) for o in objs))
+        self.assertFalse(any(o.saved for o in objs))
+
+    def test_should_create_and_save_the_objects(self):
+        pyfactory.backends['put'] = pyfactory.MethodBackend('put')
+        pyfactory.type = 'put'
+        objs = pyfactory.Factory.create_batch('test_object', 2)
+        pyfactory.type = 'django-orm'
+        del pyfactory.backends['put']
+        self.assert_(all(o.has_put for o in objs))
+
+    def test_should_generate_unique_values_per_object(self):
+        objs = pyfactory.Factory.build_batch('test_object_generator', 3)
+        self.assertEqual(len(set(o.first_name for o in objs)), 3)
+
+    def test_should_use_scalar_overrides_for_every_object(self):
+        attrs = pyfactory.Factory.attributes_for_batch(
+            'test_object', 2, first_name='overridden'
+        )
+        self.assertEqual([a['first_name'] for a in attrs], ['overridden'] * 2)
+
+    def test_should_distribute_sequence_overrides(self):
+        objs = pyfactory.Factory.build_batch(
+            'test_object_generator', 2, first_name=pyfactory.each(['a', 'b'])
+        )
+        self.assertEqual([o.first_name for o in objs], ['a', 'b'])
+
+    def test_should_use_plain_lists_for_every_object(self):
+        tags = ['t1', 't2']
+        for n in (2, 3):
+            objs = pyfactory.Factory.build_batch(
+                'test_object', n, first_name=tags
+            )
+            self.assertEqual([o.first_name for o in objs], [tags] * n)
+
+    def test_should_raise_if_a_sequence_has_the_wrong_length(self):
+        self.assertRaises(
+            pyfactory.FactoryException,
+            pyfactory.Factory.build_batch,
+            'test_object', 3, first_name=pyfactory.each(['a', 'b'])
+        )
+
+class FactoryReentranceTest(unittest.TestCase):
+    def test_should_keep_the_overrides_of_the_outer_build(self):
+        obj = pyfactory.Factory.build(
+            'test_object',
+            first_name=pyfactory.Foreign('test_object'),
+            last_name='outer'
+        )
+        self.assertEqual(obj.last_name, 'outer')
+        self.assertEqual(obj.first_name.last_name, 'the last name')
+
+class FactoryThreadingTest(unittest.TestCase):
+    def setUp(self):
+        self.errors = []
+
+    def build_objects(self, index):
+        for i in range(200):
+            name = 'thread %d, object %d' % (index, i)
+            obj = pyfactory.Factory.build('test_object', first_name=name)
+            if obj.first_name != name:
+                self.errors.append((name, obj.first_name))
+
+    def test_should_not_mix_up_overrides_of_concurrent_builds(self):
+        threads = [
+            threading.Thread(target=self.build_objects, args=(i,))
+            for i in range(16)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.errors, [])
+
+class FactoryIteratorTest(unittest.TestCase):
+    def test_should_build_the_given_number_of_objects(self):
+        objs = list(pyfactory.Factory.iter_build('test_object', 3))
+        self.assertEqual(len(objs), 3)
+        self.assert_(all(isinstance(o, Tester) for o in objs))
+
+    def test_should_generate_objects_endlessly_without_n(self):
+        objs = pyfactory.Factory.iter_build('test_object_generator')
+        names = [o.first_name for o in itertools.islice(objs, 500)]
+        self.assertEqual(len(set(names)), 500)
+
+    def test_should_yield_chunks(self):
+        chunks = pyfactory.Factory.iter_attributes(
+            'test_object', 5, chunk_size=2,
+            first_name=pyfactory.each(['a', 'b', 'c', 'd', 'e'])
+        )
+        self.assertEqual(
+            [[a['first_name'] for a in chunk] for chunk in chunks],
+            [['a', 'b'], ['c', 'd'], ['e']]
+        )
+
+    def test_should_reject_sequence_overrides_without_n(self):
+        self.assertRaises(
+            pyfactory.FactoryException,
+            pyfactory.Factory.iter_attributes,
+            'test_object', first_name=pyfactory.each(['a'])
+        )
+
+class FactorySharedForeignTest(unittest.TestCase):
+    def test_should_share_the_object_within_a_batch(self):
+        objs = pyfactory.Factory.build_batch('test_object_shared', 4)
+        self.assertEqual(len(set(id(o.first_name) for o in objs)), 1)
+
+    def test_should_hand_out_the_pool_round_robin(self):
+        objs  = pyfactory.Factory.build_batch('test_object_shared', 4)
+        names = [o.last_name for o in objs]
+        self.assertTrue(names[0] is not names[1])
+        self.assertTrue(names[0] is names[2])
+        self.assertTrue(names[1] is names[3])
+
+    def test_should_not_share_objects_between_batches(self):
+        obj1 = pyfactory.Factory.build_batch('test_object_shared', 1)[0]
+        obj2 = pyfactory.Factory.build_batch('test_object_shared', 1)[0]
+        self.assertTrue(obj1.first_name is not obj2.first_name)
+
+    def test_should_share_objects_within_a_scope(self):
+        with pyfactory.Factory.scope():
+            obj1 = pyfactory.Factory.build('test_object_shared')
+            obj2 = pyfactory.Factory.build('test_object_shared')
+        self.assertTrue(obj1.first_name is obj2.first_name)
+
+    def test_should_save_shared_objects_only_once(self):
+        with pyfactory.Factory.scope():
+            obj1 = pyfactory.Factory.create('test_object_shared')
+            obj1.first_name.saved = False
+            obj2 = pyfactory.Factory.create('test_object_shared')
+        self.assertTrue(obj1.first_name is obj2.first_name)
+        self.assertFalse(obj2.first_name.saved)
+
+    def test_should_hand_out_existing_objects_round_robin(self):
+        existing = ['a', 'b']
+        attrs = pyfactory.Factory.attributes_for_batch(
+            'test_object', 3,
+            first_name=pyfactory.Foreign('test_object', objects=existing)
+        )
+        self.assertEqual([a['first_name'] for a in attrs], ['a', 'b', 'a'])
+
+class FactoryLazyAttributeTest(unittest.TestCase):
+    def setUp(self):
+        del lazy_calls[:]
+
+    def test_should_evaluate_constructor_arguments_eagerly(self):
+        obj = pyfactory.Factory.build('test_object_keyword_lazy')
+        self.assertEqual(obj.email, 'alice@example.com')
+
+    def test_should_evaluate_attributes_assigned_by_the_constructor(self):
+        obj = pyfactory.Factory.build('test_object_keyword_lazy', name='bob')
+        self.assertEqual(obj.note, 'note for bob@example.com')
+        self.assertEqual(
+            pyfactory.Factory.attributes_for('test_object_keyword_lazy')['note'],
+            'note for alice@example.com'
+        )
+
+    def test_should_not_evaluate_lazy_attributes_on_build(self):
+        obj = pyfactory.Factory.build('test_object_lazy')
+        self.assertEqual(lazy_calls, [])
+        self.assert_(isinstance(obj, Tester))
+
+    def test_should_evaluate_lazy_attributes_on_first_access(self):
+        obj = pyfactory.Factory.build('test_object_lazy')
+        self.assertEqual(obj.greeting, 'Hello first last')
+        self.assertEqual(obj.greeting, 'Hello first last')
+        self.assertEqual(lazy_calls, ['greeting', 'full_name'])
+
+    def test_should_use_overridden_attributes(self):
+        obj = pyfactory.Factory.build('test_object_lazy', first_name='other')
+        self.assertEqual(obj.full_name, 'other last')
+
+    def test_should_keep_overridden_lazy_attributes(self):
+        obj = pyfactory.Factory.build('test_object_lazy', greeting='hi')
+        self.assertEqual(obj.greeting, 'hi')
+        objs = pyfactory.Factory.build_batch('test_object_lazy', 2,
+                                             greeting='hi')
+        self.assertEqual([o.greeting for o in objs], ['hi', 'hi'])
+        self.assertEqual(lazy_calls, [])
+
+    def test_should_evaluate_eagerly_in_dependency_order_on_create(self):
+        obj = pyfactory.Factory.create('test_object_lazy')
+        self.assertEqual(obj.__dict__['greeting'], 'Hello first last')
+        self.assertEqual(sorted(lazy_calls), ['full_name', 'greeting'])
+
+    def test_should_evaluate_eagerly_for_attributes_for(self):
+        attrs = pyfactory.Factory.attributes_for('test_object_lazy')
+        self.assertEqual(attrs['full_name'], 'first last')
+
+    def test_should_detect_cyclic_dependencies(self):
+        self.assertRaises(
+            pyfactory.FactoryException,
+            pyfactory.Factory.attributes_for,
+            'test_object_lazy',
+            full_name=pyfactory.LazyAttribute(lambda obj: obj.greeting)
+        )
+
+    def test_should_pickle_built_objects_as_model_instances(self):
+        obj = pyfactory.Factory.build('test_object_lazy')
+        obj = pickle.loads(pickle.dumps(obj))
+        self.assertEqual(type(obj), Tester)
+        self.assertEqual(obj.full_name, 'first last')
+
+class FactorySequenceTest(unittest.TestCase):
+    def setUp(self):
+        pyfactory.Factory.reset_sequences()
+        del vectorized_calls[:]
+
+    def test_should_count_from_start_by_step(self):
+        objs = pyfactory.Factory.build_batch('test_object_sequence', 3)
+        self.assertEqual([o.last_name for o in objs], [10, 15, 20])
+        obj = pyfactory.Factory.build('test_object_sequence')
+        self.assertEqual(obj.last_name, 25)
+
+    def test_should_keep_a_counter_per_factory(self):
+        pyfactory.Factory.build('test_object_sequence')
+        obj = pyfactory.Factory.build('test_object_other_sequence')
+        self.assertEqual(obj.first_name, 'name1')
+
+    def test_should_reset_the_sequences_of_a_factory(self):
+        pyfactory.Factory.build('test_object_sequence')
+        pyfactory.Factory.build('test_object_other_sequence')
+        pyfactory.Factory.reset_sequences('test_object_sequence')
+        self.assertEqual(
+            pyfactory.Factory.build('test_object_sequence').first_name,
+            'user1'
+        )
+        self.assertEqual(
+            pyfactory.Factory.build('test_object_other_sequence').first_name,
+            'name2'
+        )
+
+    def test_should_call_a_vectorized_callback_once_per_batch(self):
+        attrs = pyfactory.Factory.attributes_for_batch(
+            'test_object_sequence', 3
+        )
+        self.assertEqual(
+            [a['first_name'] for a in attrs], ['user1', 'user2', 'user3']
+        )
+        self.assertEqual(vectorized_calls, [3])
+
+    def test_should_share_named_sequences(self):
+        first  = pyfactory.Sequence(name='shared-test')
+        second = pyfactory.Sequence(name='shared-test', start=0)
+        self.assertEqual(first('build'), 1)
+        self.assertEqual(second.batch('build', 2), [1, 2])
+        pyfactory.Sequence.reset('shared-test')
+        self.assertEqual(first('build'), 1)
+
+    def test_should_reject_a_step_of_zero(self):
+        self.assertRaises(
+            pyfactory.FactoryException, pyfactory.Sequence, step=0
+        )
+
+class FactoryInheritanceTest(unittest.TestCase):
+    def setUp(self):
+        pyfactory.Factory.reset_sequences()
+
+    def test_should_not_register_abstract_factories(self):
+        first_names = [
+            element.attributes.get('first_name')
+            for element in pyfactory.Factory._elements.values()
+        ]
+        self.assertFalse('abstract first' in first_names)
+
+    def test_should_override_inherited_attributes(self):
+        obj = pyfactory.Factory.build('test_object_child')
+        self.assertEqual(type(obj), Tester)
+        self.assertEqual(obj.first_name, 'child first')
+        self.assertEqual(obj.last_name, 'last1')
+
+    def test_should_inherit_through_several_levels(self):
+        obj = pyfactory.Factory.build('test_object_grandchild')
+        self.assertEqual(obj.first_name, 'child first')
+
+    def test_should_count_inherited_sequences_per_factory(self):
+        pyfactory.Factory.build('test_object_child')
+        obj = pyfactory.Factory.build('test_object_grandchild')
+        self.assertEqual(obj.last_name, 'last1')
+
+    def test_should_inherit_from_other_elements(self):
+        attrs = pyfactory.Factory.attributes_for('test_object_nested_elements')
+        self.assertEqual(attrs, {
+            'first_name': 'the first name',
+            'last_name':  'nested last'
+        })
+
+    def test_should_inherit_the_record_and_prototype_modes(self):
+        record = pyfactory.Factory.build('test_object_record_child')
+        self.assertEqual(type(record).__name__, 'TestObjectRecordChildRecord')
+        element = pyfactory.Factory._find_factory('test_object_prototype_child')
+        self.assertTrue(element.prototype)
+
+    def test_should_flatten_the_attributes_at_class_creation(self):
+        self.assertEqual(
+            sorted(TestGrandchildFactory._attributes),
+            ['first_name', 'last_name']
+        )
+
+class FactoryPrototypeTest(unittest.TestCase):
+    def setUp(self):
+        pyfactory.Factory.reset_sequences()
+        pyfactory.Factory.invalidate_classes()
+        ExpensiveTester.constructed = 0
+        self.objects = pyfactory.Factory.build_batch('test_object_prototype', 3)
+
+    def test_should_call_the_constructor_only_for_the_template(self):
+        pyfactory.Factory.build('test_object_prototype')
+        self.assertEqual(ExpensiveTester.constructed, 1)
+
+    def test_should_assign_the_special_attributes(self):
+        self.assertEqual(
+            [o.first_name for o in self.objects], ['first1', 'first2', 'first3']
+        )
+        self.assertEqual(self.objects[2].full_name, 'first3 the last name')
+        self.assertEqual(type(self.objects[0]).__bases__, (ExpensiveTester,))
+
+    def test_should_assign_overridden_attributes(self):
+        obj = pyfactory.Factory.build(
+            'test_object_prototype', last_name='overridden'
+        )
+        self.assertEqual(obj.last_name, 'overridden')
+        self.assertEqual(obj.full_name, 'first4 overridden')
+
+    def test_should_copy_mutable_values(self):
+        first, second = self.objects[:2]
+        first.tags.append('tag')
+        first.options['active'] = False
+        self.assertEqual(second.tags, [])
+        self.assertEqual(second.options, {'active': True})
+
+    def test_should_clone_created_objects(self):
+        pyfactory.backends['put'] = pyfactory.MethodBackend('put')
+        pyfactory.type = 'put'
+        try:
+            obj = pyfactory.Factory.create('test_object_prototype')
+        finally:
+            pyfactory.type = 'django-orm'
+            del pyfactory.backends['put']
+        self.assert_(obj.has_put)
+        self.assertEqual(type(obj), ExpensiveTester)
+        self.assertEqual(obj.full_name, 'first4 the last name')
+
+class FactoryRecordTest(unittest.TestCase):
+    def setUp(self):
+        pyfactory.Factory.reset_sequences()
+        self.records = pyfactory.Factory.build_batch('test_object_record', 2)
+
+    def test_should_build_records_with_slots(self):
+        record = self.records[0]
+        self.assertEqual(type(record).__name__, 'TestObjectRecordRecord')
+        self.assertEqual(
+            type(record).__slots__, ('first_name', 'full_name', 'last_name')
+        )
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_should_evaluate_lazy_attributes_eagerly(self):
+        self.assertEqual(self.records[1].full_name, 'first last2')
+
+    def test_should_convert_records_to_dictionaries(self):
+        self.assertEqual(self.records[0]._asdict(), {
+            'first_name': 'first',
+            'last_name':  'last1',
+            'full_name':  'first last1'
+        })
+
+    def test_should_compare_records_by_value(self):
+        record = pyfactory.Factory.build('test_object_record', last_name='last1')
+        self.assertEqual(record, self.records[0])
+        self.assertNotEqual(record, self.records[1])
+        self.assertEqual(
+            repr(record),
+            "TestObjectRecordRecord(first_name='first', "
+            "full_name='first last1', last_name='last1')"
+        )
+
+    def test_should_pickle_records(self):
+        self.assertEqual(
+            pickle.loads(pickle.dumps(self.records, 2)), self.records
+        )
+
+    def test_should_need_a_klass_to_create_objects(self):
+        self.assertRaises(
+            pyfactory.FactoryException,
+            pyfactory.Factory.create,
+            'test_object_record'
+        )
+
 class GoogleAppEngineTests(unittest.TestCase):
     def setUp(self):
         pyfactory.type = 'appengine'
         self.result = pyfactory.Factory.create('test_object')
 
+    def tearDown(self):
+        pyfactory.type = 'django-orm'
+
     def test_should_call_put_instead_of_save_on_create(self):
         self.assertFalse(self.result.saved)
         self.assertTrue(self.result.has_put)
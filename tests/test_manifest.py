@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import pyfactory
+from pyfactory import cli, manifest
+
+FACTORIES = '''
+import pyfactory
+
+class Model(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class ManifestFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = '%s'
+        klass = Model
+
+    class Elements:
+        first_name = 'on demand'
+
+class NoFactory(object):
+    class Meta:
+        verbose_name = 'ignored'
+'''
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.package   = os.path.join(self.directory, 'manifest_pkg')
+        os.mkdir(self.package)
+        open(os.path.join(self.package, '__init__.py'), 'w').close()
+        for module in ('first', 'second'):
+            with open(os.path.join(self.package, module + '.py'), 'w') as f:
+                f.write(FACTORIES % ('manifest_' + module))
+        self.path = os.path.join(self.directory, 'manifest.json')
+        sys.path.insert(0, self.directory)
+        self.manifest = pyfactory.Factory._manifest
+        pyfactory.Factory._manifest = {}
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        for name in ['manifest_pkg', 'manifest_pkg.first',
+                     'manifest_pkg.second']:
+            sys.modules.pop(name, None)
+        for name in ('manifest_first', 'manifest_second'):
+            pyfactory.Factory._elements.pop(name, None)
+        pyfactory.Factory._manifest = self.manifest
+        shutil.rmtree(self.directory)
+
+    def test_should_find_the_factories_without_importing(self):
+        self.assertEqual(manifest.scan([self.package], self.directory), {
+            'manifest_first':  'manifest_pkg.first',
+            'manifest_second': 'manifest_pkg.second'
+        })
+        self.assertFalse('manifest_pkg.first' in sys.modules)
+
+    def test_should_write_the_manifest_on_the_command_line(self):
+        cli.main([
+            'manifest', '-r', self.directory, '-o', self.path, self.package
+        ])
+        self.assertEqual(
+            json.load(open(self.path))['manifest_first'], 'manifest_pkg.first'
+        )
+
+    def test_should_import_only_the_used_factories(self):
+        with open(self.path, 'w') as f:
+            manifest.write(manifest.scan([self.package], self.directory), f)
+        pyfactory.Factory.load_manifest(self.path)
+
+        obj = pyfactory.Factory.build('manifest_first')
+        self.assertEqual(obj.first_name, 'on demand')
+        self.assert_('manifest_pkg.first' in sys.modules)
+        self.assertFalse('manifest_pkg.second' in sys.modules)
+
+    def test_should_raise_for_factories_missing_in_the_module(self):
+        pyfactory.Factory._manifest['manifest_missing'] = 'manifest_pkg.first'
+        self.assertRaises(
+            pyfactory.FactoryException,
+            pyfactory.Factory.build,
+            'manifest_missing'
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import pyfactory
+from pyfactory import providers
+from test_factory import Tester
+import test_providers
+
+class ParallelGenerationTest(unittest.TestCase):
+    def setUp(self):
+        self.chunks = list(pyfactory.Factory.generate_parallel(
+            'test_object_generator', 250, workers=2, chunk_size=100
+        ))
+        self.objects = sum(self.chunks, [])
+
+    def test_should_stream_the_objects_in_chunks(self):
+        self.assertEqual([len(c) for c in self.chunks], [100, 100, 50])
+
+    def test_should_build_the_objects(self):
+        self.assert_(all(isinstance(o, Tester) for o in self.objects))
+
+    def test_should_generate_unique_values_across_workers(self):
+        names = set(o.first_name for o in self.objects)
+        names.add(pyfactory.Factory.build('test_object_generator').first_name)
+        self.assertEqual(len(names), 251)
+
+    def test_should_distribute_sequence_overrides_over_the_chunks(self):
+        chunks = pyfactory.Factory.generate_parallel(
+            'test_object', 3, workers=2, chunk_size=2,
+            method='attributes_for', first_name=pyfactory.each(['a', 'b', 'c'])
+        )
+        attrs = sum(chunks, [])
+        self.assertEqual([a['first_name'] for a in attrs], ['a', 'b', 'c'])
+
+    def test_should_slice_the_sequences_over_the_chunks(self):
+        factory = 'test_object_other_sequence'
+        first   = pyfactory.Factory.attributes_for(factory)['first_name']
+        start   = int(first[len('name'):]) + 1
+        chunks  = pyfactory.Factory.generate_parallel(
+            factory, 40, workers=2, chunk_size=10, method='attributes_for'
+        )
+        names = [a['first_name'] for a in sum(chunks, [])]
+        self.assertEqual(names, ['name%d' % i for i in range(start, start + 40)])
+        self.assertEqual(
+            pyfactory.Factory.attributes_for(factory)['first_name'],
+            'name%d' % (start + 40)
+        )
+
+    def test_should_generate_the_provider_values_of_a_single_batch(self):
+        providers.Provider.reseed(0)
+        rows = pyfactory.Factory.attributes_for_batch('provider_object', 30)
+        providers.Provider.reseed(0)
+        chunks = pyfactory.Factory.generate_parallel(
+            'provider_object', 30, workers=2, chunk_size=7,
+            method='attributes_for'
+        )
+        self.assertEqual(sum(chunks, []), rows)
+
+class WorkerError(Exception):
+    """An exception, which can't be unpickled"""
+    def __init__(self, code, msg):
+        Exception.__init__(self, msg)
+        self.code = code
+
+def fail(error):
+    def callback(i):
+        raise error
+    return callback
+
+class TestFailingFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_failing'
+        klass = Tester
+
+    class Elements:
+        first_name = pyfactory.Generator(
+            fail(pyfactory.FactoryException('broken'))
+        )
+
+class TestUnpicklableFailureFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'test_object_unpicklable_failure'
+        klass = Tester
+
+    class Elements:
+        first_name = pyfactory.Generator(fail(WorkerError(1, 'broken')))
+
+class ParallelFailureTest(unittest.TestCase):
+    def generate(self, factory_name):
+        return list(pyfactory.Factory.generate_parallel(
+            factory_name, 4, workers=2, chunk_size=2
+        ))
+
+    def test_should_raise_the_errors_of_the_workers(self):
+        self.assertRaises(
+            pyfactory.FactoryException, self.generate, 'test_object_failing'
+        )
+
+    def test_should_raise_errors_which_cant_be_unpickled(self):
+        self.assertRaises(
+            pyfactory.FactoryException,
+            self.generate,
+            'test_object_unpicklable_failure'
+        )
+
+if __name__ == '__main__':
+    unittest.main()
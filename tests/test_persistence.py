@@ -0,0 +1,379 @@
+import gc
+import time
+import sqlite3
+import itertools
+import warnings
+import threading
+import unittest
+import pyfactory
+
+class Record(object):
+    """This class represents a model class stored in SQLite"""
+    def __init__(self, **kwargs):
+        self.id = None
+        for key, val in kwargs.items():
+            setattr(self, key, val)
+
+class SQLiteBackend(pyfactory.Backend):
+    """A stand-in for a database backend, which counts the round trips"""
+    def __init__(self, chunk_size=500):
+        pyfactory.Backend.__init__(self, chunk_size)
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute(
+            'CREATE TABLE record (id INTEGER PRIMARY KEY, name TEXT)'
+        )
+        self.round_trips = 0
+
+    def count(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM record'
+        ).fetchone()[0]
+
+    def save(self, obj):
+        self.round_trips += 1
+        cursor = self.connection.execute(
+            'INSERT INTO record (name) VALUES (?)', (obj.name,)
+        )
+        obj.id = cursor.lastrowid
+
+class SQLiteBatchBackend(SQLiteBackend):
+    def save_batch(self, objs):
+        self.round_trips += 1
+        self.connection.executemany(
+            'INSERT INTO record (name) VALUES (?)', [(o.name,) for o in objs]
+        )
+
+class SlowBackend(pyfactory.Backend):
+    """A backend with a high latency, which tracks the concurrent saves"""
+    def __init__(self):
+        pyfactory.Backend.__init__(self)
+        self.lock      = threading.Lock()
+        self.in_flight = 0
+        self.peak      = 0
+        self.saved     = []
+
+    def save(self, obj):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+            self.saved.append(obj)
+
+class BatchLogBackend(pyfactory.Backend):
+    """A backend, which logs the class and size of every batch"""
+    def __init__(self, chunk_size=500):
+        pyfactory.Backend.__init__(self, chunk_size)
+        self.batches = []
+
+    def save(self, obj):
+        self.batches.append((type(obj).__name__, 1))
+
+    def save_batch(self, objs):
+        self.batches.append((type(objs[0]).__name__, len(objs)))
+
+class TrackingBackend(BatchLogBackend):
+    """A backend, which assigns ids and logs the deletes"""
+    def __init__(self, chunk_size=500):
+        BatchLogBackend.__init__(self, chunk_size)
+        self.ids     = itertools.count(1)
+        self.deletes = []
+
+    def save(self, obj):
+        BatchLogBackend.save(self, obj)
+        obj.id = next(self.ids)
+
+    def save_batch(self, objs):
+        BatchLogBackend.save_batch(self, objs)
+        for obj in objs:
+            obj.id = next(self.ids)
+
+    def key(self, obj):
+        return obj.id
+
+    def delete_batch(self, objs):
+        self.deletes.append((type(objs[0]).__name__, len(objs)))
+
+    def delete_keys(self, klass, keys):
+        self.deletes.append((klass.__name__, sorted(keys)))
+
+class KeylessBatchBackend(TrackingBackend):
+    """A backend, whose save_batch doesn't assign ids (like bulk_create)"""
+    def save_batch(self, objs):
+        BatchLogBackend.save_batch(self, objs)
+
+    def returns_keys(self, klass):
+        return False
+
+class Owner(Record):
+    pass
+
+class Item(Record):
+    pass
+
+class RecordFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'persistence_record'
+        klass = Record
+
+    class Elements:
+        name = pyfactory.Generator(lambda i: 'record %d' % i)
+
+class OwnerFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'persistence_owner'
+        klass = Owner
+
+    class Elements:
+        name = 'owner'
+
+class ItemFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'persistence_item'
+        klass = Item
+
+    class Elements:
+        name  = 'item'
+        owner = pyfactory.Foreign('persistence_owner')
+
+class PersistenceTestCase(unittest.TestCase):
+    def use_backend(self, backend):
+        self.backend = backend
+        pyfactory.backends['sqlite'] = backend
+        pyfactory.type = 'sqlite'
+
+    def tearDown(self):
+        pyfactory.type = 'django-orm'
+        del pyfactory.backends['sqlite']
+
+class BackendCreateTest(PersistenceTestCase):
+    def setUp(self):
+        self.use_backend(SQLiteBatchBackend())
+        self.object = pyfactory.Factory.create('persistence_record')
+
+    def test_should_save_single_objects_through_the_backend(self):
+        self.assertEqual(self.backend.count(), 1)
+        self.assertNotEqual(self.object.id, None)
+
+class BackendBatchTest(PersistenceTestCase):
+    def setUp(self):
+        self.use_backend(SQLiteBatchBackend(chunk_size=2))
+        self.objects = pyfactory.Factory.create_batch('persistence_record', 5)
+
+    def test_should_save_all_objects(self):
+        self.assertEqual(len(self.objects), 5)
+        self.assertEqual(self.backend.count(), 5)
+
+    def test_should_save_the_objects_in_chunks(self):
+        self.assertEqual(self.backend.round_trips, 3)
+
+class BackendFallbackTest(PersistenceTestCase):
+    def setUp(self):
+        self.use_backend(SQLiteBackend(chunk_size=2))
+        self.objects = pyfactory.Factory.create_batch('persistence_record', 5)
+
+    def test_should_save_every_object_on_its_own(self):
+        self.assertEqual(self.backend.count(), 5)
+        self.assertEqual(self.backend.round_trips, 5)
+        self.assert_(all(o.id is not None for o in self.objects))
+
+class BackendConcurrentTest(PersistenceTestCase):
+    def setUp(self):
+        self.use_backend(SlowBackend())
+        self.names   = ['n%d' % i for i in range(12)]
+        self.objects = pyfactory.Factory.create_concurrent(
+            'persistence_record', 12, concurrency=4,
+            name=pyfactory.each(self.names)
+        )
+
+    def test_should_create_all_objects_in_order(self):
+        self.assertEqual([o.name for o in self.objects], self.names)
+        self.assertEqual(len(self.backend.saved), 12)
+
+    def test_should_overlap_the_saves(self):
+        self.assert_(self.backend.peak > 1)
+
+    def test_should_not_exceed_the_concurrency(self):
+        self.assert_(self.backend.peak <= 4)
+
+class SessionTest(PersistenceTestCase):
+    def setUp(self):
+        self.use_backend(BatchLogBackend(chunk_size=3))
+
+    def test_should_save_nothing_before_the_end_of_the_session(self):
+        with pyfactory.Factory.session() as session:
+            pyfactory.Factory.create('persistence_item')
+            self.assertEqual(self.backend.batches, [])
+            self.assertEqual(len(session), 2)
+
+    def test_should_save_grouped_by_class_in_dependency_order(self):
+        with pyfactory.Factory.session():
+            for i in range(4):
+                pyfactory.Factory.create('persistence_item')
+            pyfactory.Factory.create('persistence_owner')
+        self.assertEqual(self.backend.batches, [
+            ('Owner', 3), ('Owner', 2), ('Item', 3), ('Item', 1)
+        ])
+
+    def test_should_record_batches(self):
+        with pyfactory.Factory.session():
+            items = pyfactory.Factory.create_batch('persistence_item', 2)
+        self.assertEqual(self.backend.batches, [('Owner', 2), ('Item', 2)])
+        self.assertEqual(type(items[0].owner), Owner)
+
+    def test_should_save_referenced_objects_one_by_one_without_keys(self):
+        self.use_backend(KeylessBatchBackend(chunk_size=3))
+        with pyfactory.Factory.session():
+            items = pyfactory.Factory.create_batch('persistence_item', 2)
+        self.assertEqual(self.backend.batches, [
+            ('Owner', 1), ('Owner', 1), ('Item', 2)
+        ])
+        self.assertEqual([item.owner.id for item in items], [1, 2])
+
+    def test_should_join_an_outer_session(self):
+        with pyfactory.Factory.session() as outer:
+            with pyfactory.Factory.session() as inner:
+                pyfactory.Factory.create('persistence_owner')
+            self.assertEqual(self.backend.batches, [])
+        self.assert_(inner is outer)
+        self.assertEqual(self.backend.batches, [('Owner', 1)])
+
+    def test_should_discard_the_objects_on_errors(self):
+        def create():
+            with pyfactory.Factory.session():
+                pyfactory.Factory.create('persistence_item')
+                raise ValueError()
+        self.assertRaises(ValueError, create)
+        self.assertEqual(self.backend.batches, [])
+        pyfactory.Factory.create('persistence_owner')
+        self.assertEqual(self.backend.batches, [('Owner', 1)])
+
+    def test_should_keep_the_creation_order_for_cyclic_dependencies(self):
+        session = pyfactory.factory.Session()
+        with session.recording(Owner):
+            with session.recording(Item):
+                session.add(Item, [Item()])
+            session.add(Owner, [Owner()])
+        with session.recording(Item):
+            with session.recording(Owner):
+                session.add(Owner, [Owner(), Owner()])
+            session.add(Item, [Item()])
+        session.flush(self.backend)
+        self.assertEqual(self.backend.batches, [
+            ('Item', 1), ('Owner', 3), ('Item', 1)
+        ])
+
+class CleanupTest(PersistenceTestCase):
+    def setUp(self):
+        self.use_backend(TrackingBackend(chunk_size=2))
+        pyfactory.Factory.cleanup()
+        pyfactory.Factory.track(True)
+
+    def tearDown(self):
+        pyfactory.Factory.track(False)
+        pyfactory.Factory.cleanup()
+        PersistenceTestCase.tearDown(self)
+
+    def test_should_delete_in_reverse_dependency_order(self):
+        items = pyfactory.Factory.create_batch('persistence_item', 3)
+        owner = pyfactory.Factory.create('persistence_owner')
+        pyfactory.Factory.cleanup()
+        self.assertEqual(self.backend.deletes, [
+            ('Item', 2), ('Item', 1), ('Owner', 2), ('Owner', 2)
+        ])
+
+    def test_should_delete_collected_objects_by_key(self):
+        with pyfactory.Factory.session():
+            pyfactory.Factory.create('persistence_item')
+        gc.collect()
+        pyfactory.Factory.cleanup()
+        self.assertEqual(self.backend.deletes, [('Item', [2]), ('Owner', [1])])
+
+    def test_should_keep_the_objects_not_deleted_on_errors(self):
+        items = pyfactory.Factory.create_batch('persistence_item', 3)
+        delete_batch = self.backend.delete_batch
+        def fail(objs):
+            if self.backend.deletes:
+                raise ValueError()
+            delete_batch(objs)
+        self.backend.delete_batch = fail
+        self.assertRaises(ValueError, pyfactory.Factory.cleanup)
+        self.assertEqual(self.backend.deletes, [('Item', 2)])
+        self.backend.delete_batch = delete_batch
+        pyfactory.Factory.cleanup()
+        self.assertEqual(self.backend.deletes, [
+            ('Item', 2), ('Item', 1), ('Owner', 2), ('Owner', 1)
+        ])
+
+    def test_should_forget_the_deleted_objects(self):
+        owner = pyfactory.Factory.create('persistence_owner')
+        pyfactory.Factory.cleanup()
+        pyfactory.Factory.cleanup()
+        self.assertEqual(self.backend.deletes, [('Owner', 1)])
+
+    def test_should_not_track_by_default(self):
+        pyfactory.Factory.track(False)
+        owner = pyfactory.Factory.create('persistence_owner')
+        pyfactory.Factory.cleanup()
+        self.assertEqual(self.backend.deletes, [])
+
+    def test_should_track_within_the_block(self):
+        pyfactory.Factory.track(False)
+        with pyfactory.Factory.tracking():
+            first = pyfactory.Factory.create('persistence_owner')
+        second = pyfactory.Factory.create('persistence_owner')
+        pyfactory.Factory.cleanup()
+        self.assertEqual(self.backend.deletes, [('Owner', 1)])
+
+    def test_should_forget_collected_objects_without_a_key(self):
+        self.use_backend(BatchLogBackend())
+        for i in range(3000):
+            pyfactory.Factory.create('persistence_owner')
+        self.assert_(len(pyfactory.factory._created) < 2000)
+
+    def test_should_warn_about_missing_keys(self):
+        self.backend.save = lambda obj: None
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            owner = pyfactory.Factory.create('persistence_owner')
+        self.assertEqual(len(caught), 1)
+        self.assert_(issubclass(caught[0].category, RuntimeWarning))
+
+class DjangoField(object):
+    """A stand-in for a foreign key field of a Django model"""
+    remote_field = True
+    attname      = 'owner_id'
+
+    def get_cached_value(self, obj, default):
+        return obj.__dict__.get('owner', default)
+
+class DjangoManager(object):
+    def bulk_create(self, objs):
+        self.owner_ids = [obj.owner_id for obj in objs]
+
+class DjangoItem(Record):
+    class _meta(object):
+        concrete_fields = [DjangoField()]
+    _default_manager = DjangoManager()
+
+class DjangoBackendTest(unittest.TestCase):
+    def test_should_copy_the_keys_of_objects_saved_after_assignment(self):
+        owner = Owner()
+        owner.pk = None
+        items = [DjangoItem(owner=owner, owner_id=None) for i in range(2)]
+        owner.pk = 7
+        pyfactory.DjangoBackend().save_batch(items)
+        self.assertEqual(DjangoItem._default_manager.owner_ids, [7, 7])
+
+    def test_should_not_delete_objects_without_primary_key(self):
+        owner = Owner()
+        owner.pk = None
+        self.assertRaises(
+            pyfactory.FactoryException,
+            pyfactory.DjangoBackend().delete_batch,
+            [owner]
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import pyfactory
+from pyfactory import profiling
+from pyfactory.factory import FactoryElement
+
+original_build = FactoryElement.__dict__['build']
+original_call  = pyfactory.Generator.__dict__['__call__']
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        pyfactory.backends['put'] = pyfactory.MethodBackend('put')
+        pyfactory.type = 'put'
+        with pyfactory.Factory.profile() as self.profiler:
+            pyfactory.Factory.build('test_object_foreign')
+            pyfactory.Factory.create('test_object_generator')
+            pyfactory.Factory.build_batch('test_object_generator', 3)
+        self.stats = pyfactory.Factory.stats()
+
+    def tearDown(self):
+        pyfactory.type = 'django-orm'
+        del pyfactory.backends['put']
+
+    def test_should_count_the_calls_per_factory_and_phase(self):
+        stats = self.stats['test_object_generator']
+        self.assertEqual(stats['create']['calls'], 1)
+        self.assertEqual(stats['build_batch']['calls'], 1)
+        self.assertEqual(stats['generator']['calls'], 2)
+        self.assertEqual(stats['save']['calls'], 1)
+        self.assertEqual(stats['lookup']['calls'], 2)
+
+    def test_should_count_one_call_per_item_of_an_iterator(self):
+        with pyfactory.Factory.profile():
+            list(pyfactory.Factory.iter_build('test_object', 3))
+        stats = pyfactory.Factory.stats()['test_object']
+        self.assertEqual(stats['attributes']['calls'], 3)
+
+    def test_should_record_nested_factories_separately(self):
+        self.assertEqual(self.stats['test_object']['build']['calls'], 1)
+        self.assertEqual(
+            self.stats['test_object_foreign']['foreign']['calls'], 1
+        )
+
+    def test_should_exclude_nested_phases_from_the_self_time(self):
+        stats = self.stats['test_object_foreign']
+        self.assertAlmostEqual(
+            stats['attributes']['selftime'] + stats['foreign']['cumtime'],
+            stats['attributes']['cumtime']
+        )
+        self.assertAlmostEqual(
+            stats['build']['selftime'] + stats['fetch_class']['cumtime'] +
+            stats['attributes']['cumtime'],
+            stats['build']['cumtime']
+        )
+
+    def test_should_restore_the_original_methods(self):
+        self.assertEqual(profiling.active, None)
+        self.assertTrue(FactoryElement.__dict__['build'] is original_build)
+        self.assertTrue(
+            pyfactory.Generator.__dict__['__call__'] is original_call
+        )
+
+    def test_should_not_record_anything_after_the_block(self):
+        pyfactory.Factory.build('test_object')
+        self.assertEqual(pyfactory.Factory.stats(), self.stats)
+
+if __name__ == '__main__':
+    unittest.main()
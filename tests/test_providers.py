@@ -0,0 +1,92 @@
+import datetime
+import unittest
+import pyfactory
+from pyfactory import providers
+from test_factory import Tester
+
+class ProviderFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'provider_object'
+        klass = Tester
+
+    class Elements:
+        name     = providers.Name()
+        email    = providers.Email(domain='example.org')
+        homepage = providers.URL()
+        age      = providers.Integer(18, 99)
+        born     = providers.Date(datetime.date(1990, 1, 1),
+                                  datetime.date(1990, 1, 31))
+        plan     = providers.Choice(['free', 'pro', 'none'], [3, 1, 0])
+
+class OtherProviderFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'provider_other_object'
+        klass = Tester
+
+    class Elements:
+        age = providers.Integer(18, 99)
+
+class ProviderTest(unittest.TestCase):
+    def setUp(self):
+        providers.Provider.reseed(0)
+
+    def attributes(self, *sizes):
+        rows = []
+        for n in sizes:
+            rows.extend(
+                pyfactory.Factory.attributes_for_batch('provider_object', n)
+            )
+        return rows
+
+    def test_should_not_depend_on_the_batch_size(self):
+        rows = self.attributes(10)
+        providers.Provider.reseed()
+        self.assertEqual(self.attributes(1, 3, 6), rows)
+        providers.Provider.reseed()
+        self.assertEqual(
+            [pyfactory.Factory.attributes_for('provider_object')
+             for i in range(10)],
+            rows
+        )
+
+    def test_should_continue_the_stream_across_blocks(self):
+        size = providers.Provider.BLOCK_SIZE
+        rows = self.attributes(size + 10)
+        providers.Provider.reseed()
+        self.assertEqual(self.attributes(size - 5, 15), rows)
+
+    def test_should_depend_on_the_seed(self):
+        rows = self.attributes(10)
+        providers.Provider.reseed(1)
+        self.assertNotEqual(self.attributes(10), rows)
+
+    def test_should_use_a_stream_per_factory_and_attribute(self):
+        ages = [r['age'] for r in self.attributes(5)]
+        other = pyfactory.Factory.attributes_for_batch(
+            'provider_other_object', 5
+        )
+        self.assertNotEqual([r['age'] for r in other], ages)
+
+    def test_should_generate_values_in_their_ranges(self):
+        for row in self.attributes(200):
+            self.assert_(18 <= row['age'] <= 99)
+            self.assertEqual((row['born'].year, row['born'].month), (1990, 1))
+            self.assert_(row['email'].endswith('@example.org'))
+            self.assert_(row['homepage'].startswith('https://www.'))
+            self.assertEqual(len(row['name'].split()), 2)
+
+    def test_should_choose_by_weight(self):
+        plans = [r['plan'] for r in self.attributes(400)]
+        self.assertFalse('none' in plans)
+        self.assert_(plans.count('free') > 2 * plans.count('pro'))
+
+    def test_should_reject_invalid_arguments(self):
+        self.assertRaises(
+            pyfactory.FactoryException, providers.Integer, 5, 4
+        )
+        self.assertRaises(
+            pyfactory.FactoryException, providers.Choice, ['a'], [1, 2]
+        )
+
+if __name__ == '__main__':
+    unittest.main()
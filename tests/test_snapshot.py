@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pyfactory
+from pyfactory import snapshot
+from test_factory import Tester
+
+def generate_name(i):
+    return 'name %d' % i
+
+class SnapshotChildFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'snapshot_child'
+        klass = Tester
+
+    class Elements:
+        first_name = pyfactory.Generator(generate_name)
+
+class SnapshotParentFactory(pyfactory.FactoryObject):
+    class Meta:
+        name  = 'snapshot_parent'
+        klass = Tester
+
+    class Elements:
+        first_name = pyfactory.Generator(generate_name)
+        last_name  = pyfactory.Foreign('snapshot_child')
+
+def compile_callback():
+    namespace = {}
+    exec compile(
+        "def callback(i):\n"
+        "    return ''.join(c for c in str(i) if (lambda d: d)(c))\n",
+        'callbacks.py', 'exec'
+    ) in namespace
+    return namespace['callback']
+
+def make_callback(prefix):
+    return lambda i: '%s %d' % (prefix, i)
+
+class Unprintable(object):
+    pass
+
+class FingerprintTest(unittest.TestCase):
+    def fingerprint(self, value):
+        return snapshot._fingerprint(value, pyfactory.Factory, ())
+
+    def test_should_not_depend_on_the_addresses_of_nested_code(self):
+        self.assertEqual(
+            self.fingerprint(pyfactory.Generator(compile_callback())),
+            self.fingerprint(pyfactory.Generator(compile_callback()))
+        )
+
+    def test_should_include_the_closure(self):
+        self.assertNotEqual(
+            self.fingerprint(pyfactory.Generator(make_callback('foo'))),
+            self.fingerprint(pyfactory.Generator(make_callback('bar')))
+        )
+
+    def test_should_include_the_used_globals(self):
+        global generate_name
+        before = self.fingerprint(pyfactory.Generator(lambda i: generate_name(i)))
+        original = generate_name
+        generate_name = lambda i: 'other %d' % i
+        try:
+            after = self.fingerprint(
+                pyfactory.Generator(lambda i: generate_name(i))
+            )
+        finally:
+            generate_name = original
+        self.assertNotEqual(before, after)
+
+    def test_should_reject_values_with_addresses(self):
+        self.assertRaises(
+            pyfactory.FactoryException, self.fingerprint, Unprintable()
+        )
+
+class SnapshotCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache     = pyfactory.SnapshotCache(self.directory)
+        self.original  = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        for name, attrs in self.original.items():
+            element = pyfactory.Factory._find_factory(name)
+            element.attributes = attrs
+            element._compile()
+
+    def snapshots(self):
+        return sorted(os.listdir(self.directory))
+
+    def redefine(self, name, **attrs):
+        element = pyfactory.Factory._find_factory(name)
+        self.original.setdefault(name, element.attributes)
+        element.attributes = dict(element.attributes, **attrs)
+        element._compile()
+
+    def test_should_store_a_snapshot(self):
+        self.cache.attributes_for('snapshot_parent')
+        self.assertEqual(len(self.snapshots()), 1)
+
+    def test_should_reload_the_snapshot(self):
+        first  = self.cache.attributes_for('snapshot_parent')
+        second = self.cache.attributes_for('snapshot_parent')
+        self.assertEqual(first, second)
+        self.assertTrue(first is not second)
+
+    def test_should_reload_built_object_graphs(self):
+        first  = self.cache.build_batch('snapshot_parent', 3)
+        second = self.cache.build_batch('snapshot_parent', 3)
+        self.assertEqual(
+            [o.last_name.first_name for o in first],
+            [o.last_name.first_name for o in second]
+        )
+
+    def test_should_key_the_snapshots_by_the_overrides(self):
+        self.cache.attributes_for('snapshot_parent', first_name='a')
+        attrs = self.cache.attributes_for('snapshot_parent', first_name='b')
+        self.assertEqual(attrs['first_name'], 'b')
+        self.assertEqual(len(self.snapshots()), 2)
+
+    def test_should_rebuild_if_the_definition_changes(self):
+        self.cache.attributes_for('snapshot_parent')
+        old = self.snapshots()
+        self.redefine('snapshot_parent', first_name='static')
+        attrs = self.cache.attributes_for('snapshot_parent')
+        self.assertEqual(attrs['first_name'], 'static')
+        self.assertNotEqual(self.snapshots(), old)
+        self.assertEqual(len(self.snapshots()), 1)
+
+    def test_should_rebuild_if_a_foreign_definition_changes(self):
+        self.cache.attributes_for('snapshot_parent')
+        self.redefine('snapshot_child', first_name='static')
+        attrs = self.cache.attributes_for('snapshot_parent')
+        self.assertEqual(attrs['last_name']['first_name'], 'static')
+
+if __name__ == '__main__':
+    unittest.main()